@@ -0,0 +1 @@
+"""性能基准脚本（不随应用部署，运行方式见各模块说明）"""
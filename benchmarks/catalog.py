@@ -0,0 +1,172 @@
+"""合成业务场景库：按给定规模生成带中文内容的场景、步骤与配图，用于基准测试
+
+    python -m benchmarks.catalog --scenes 5000 --workdir /tmp/xy-bench
+
+生成结果写入 workdir 下的临时 SQLite 数据库、instance 目录与上传目录（通过环境变量
+DATABASE_URL / INSTANCE_DIR / UPLOAD_FOLDER 指向，需在导入 app 之前调用 use_workdir()），
+不影响正式数据。场景与步骤按批 INSERT ... RETURNING 写入，每批同时建立全文索引并提交，
+内存占用与场景数无关；注意事项与批量导入一样在写入时直接计算。
+"""
+import argparse
+import io
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+CATEGORIES = ('取款业务', '存款业务', '开户业务', '挂失业务', '转账汇款', '外汇业务', '理财业务', '对公业务')
+SUBJECTS = ('本人', '代办', '大额', '小额', '批量', '跨行', '预约', '紧急', '企业', '老年客户')
+ACTIONS = (
+    '收取客户银行卡', '核验客户身份证件', '联网核查身份信息', '进行"三必问"身份核实', '查询账户状态',
+    '确认交易金额', '请客户输入密码', '打印业务凭证', '客户电子签名确认', '现金清分与复核',
+    '点钞并交付客户', '授权主管审批', '登记业务台账', '扫描影像资料', '检查反洗钱风险等级',
+    '录入客户联系方式', '核对预留印鉴', '发放存折', '收回旧卡并剪角', '提醒客户妥善保管凭证',
+)
+TRANSACTION_CODES = ('1159', '2520', '0800', '2169', '1160', '2379', '3001', '3105', '4410', '5020')
+DETAIL_LINES = (
+    '双手接过客户证件，检查是否在有效期内',
+    '核对系统返回信息与客户陈述是否一致',
+    '金额超过5万元需主管授权',
+    '注意观察客户神态，发现异常及时报告',
+    '凭证需客户本人签名，签名须清晰完整',
+    '现金必须经过点钞机清分后再交付',
+    '代办业务需同时核验代办人与被代办人证件',
+    '确认账户无只收不付、不收不付等管控状态',
+    '按规定留存业务影像资料',
+    '向客户提示电信诈骗风险',
+)
+CONDITIONS = (None, None, None, '金额≥5万元', '代办业务', '证件临近有效期', '账户存在管控状态')
+
+
+def use_workdir(workdir):
+    """把数据库、instance 目录与上传目录指向 workdir（须在导入 app 之前调用）"""
+    workdir = os.path.abspath(workdir)
+    os.makedirs(workdir, exist_ok=True)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'catalog.db')}"
+    os.environ['INSTANCE_DIR'] = os.path.join(workdir, 'instance')
+    os.environ['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    return workdir
+
+
+def make_images(upload_folder, count, seed=1):
+    """生成 count 张不同内容的截图样式图片（经正式的上传处理流程），返回图片 URL 列表"""
+    from PIL import Image, ImageDraw
+
+    import image_pipeline
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        img = Image.new('RGB', (rng.choice((800, 1280, 1600)), rng.choice((600, 900))), 'white')
+        draw = ImageDraw.Draw(img)
+        for _ in range(40):
+            x, y = rng.randrange(img.width), rng.randrange(img.height)
+            draw.rectangle((x, y, x + rng.randrange(20, 300), y + rng.randrange(8, 40)),
+                           fill=tuple(rng.randrange(256) for _ in range(3)))
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG')
+        urls.append(f"/static/uploads/{image_pipeline.process_upload(buffer.getvalue(), upload_folder)}")
+    return urls
+
+
+def generate_scene(rng, index, min_steps, max_steps, image_urls=(), image_ratio=0.0):
+    category = rng.choice(CATEGORIES)
+    subject = rng.choice(SUBJECTS)
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=rng.randrange(60 * 24 * 700))
+    steps = []
+    for number in range(1, rng.randint(min_steps, max_steps) + 1):
+        steps.append({
+            'step_number': number,
+            'description': f'{rng.choice(ACTIONS)}（{subject}{category}）',
+            'transaction_code': rng.choice(TRANSACTION_CODES) if rng.random() < 0.4 else None,
+            'details': '\n'.join(f'{i}. {line}' for i, line in
+                                 enumerate(rng.sample(DETAIL_LINES, rng.randint(1, 4)), 1)),
+            'condition': rng.choice(CONDITIONS),
+            'image_url': rng.choice(image_urls) if image_urls and rng.random() < image_ratio else None,
+        })
+    return {
+        'name': f'{subject}{category}-{index:06d}',
+        'description': f'{subject}{category}标准操作流程（第 {index} 号）',
+        'category': category,
+        'creator_department': rng.choice(('营业部', '城东支行', '城西支行', '运营管理部')),
+        'creator_name': rng.choice(('张敏', '李强', '王芳', '刘洋', '陈静')),
+        'created_at': created_at,
+        'updated_at': created_at + timedelta(days=rng.randrange(90)),
+        'steps': steps,
+    }
+
+
+def populate(session, scene_model, step_model, count, min_steps=10, max_steps=40, image_urls=(),
+             image_ratio=0.1, seed=1, batch_size=500, progress=None):
+    """写入 count 个合成场景，返回 {'scenes', 'steps', 'seconds'}"""
+    from sqlalchemy import insert
+
+    import change_bus
+    import search_index
+    from step_notes import NOTES_VERSION, compute_step_notes, dump_notes
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    offset = session.query(scene_model).count()
+    total_steps = 0
+    for start in range(0, count, batch_size):
+        batch = [generate_scene(rng, offset + start + i + 1, min_steps, max_steps, image_urls, image_ratio)
+                 for i in range(min(batch_size, count - start))]
+        ids = session.scalars(
+            insert(scene_model).returning(scene_model.id, sort_by_parameter_order=True),
+            [{k: v for k, v in scene.items() if k != 'steps'} for scene in batch]).all()
+        step_rows = [dict(step, scene_id=scene_id, notes=dump_notes(compute_step_notes(step['description'])),
+                          notes_version=NOTES_VERSION)
+                     for scene_id, scene in zip(ids, batch) for step in scene['steps']]
+        session.execute(insert(step_model), step_rows)
+        for scene_id in ids:
+            search_index.index_scene(session, scene_id)
+        change_bus.record_changes(session, [
+            change_bus.Change(change_bus.SCENE, scene_id, scene_id, change_bus.CREATED) for scene_id in ids])
+        session.commit()
+        total_steps += len(step_rows)
+        if progress:
+            progress(start + len(batch), count)
+    return {'scenes': count, 'steps': total_steps, 'seconds': round(time.perf_counter() - started, 2)}
+
+
+def build_catalog(scenes, min_steps=10, max_steps=40, images=8, image_ratio=0.1, seed=1, quiet=False):
+    """在已指向工作目录的 app 中建库并写入合成场景（use_workdir 之后调用），返回统计
+
+    至少生成一张配图：配图经正式的上传处理流程，images=0 时也要保证这条路径被执行到。
+    """
+    from app import BusinessScene, SceneStep, app, db, init_schema
+
+    with app.app_context():
+        init_schema()
+        image_urls = make_images(app.config['UPLOAD_FOLDER'], max(1, images), seed)
+
+        def progress(done, total):
+            if not quiet:
+                print(f'\r写入场景 {done}/{total}', end='', flush=True)
+
+        stats = populate(db.session, BusinessScene, SceneStep, scenes, min_steps, max_steps,
+                         image_urls, image_ratio, seed, progress=progress)
+    if not quiet:
+        print()
+    stats['images'] = len(image_urls)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='生成合成业务场景库')
+    parser.add_argument('--workdir', required=True, help='数据库与上传文件的存放目录')
+    parser.add_argument('--scenes', type=int, default=1000)
+    parser.add_argument('--min-steps', type=int, default=10)
+    parser.add_argument('--max-steps', type=int, default=40)
+    parser.add_argument('--images', type=int, default=8, help='生成的不同配图数量（至少 1 张）')
+    parser.add_argument('--image-ratio', type=float, default=0.1, help='带配图的步骤比例')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    use_workdir(args.workdir)
+    stats = build_catalog(args.scenes, args.min_steps, args.max_steps, args.images, args.image_ratio, args.seed)
+    print(f"已生成 {stats['scenes']} 个场景、{stats['steps']} 个步骤、{stats['images']} 张配图，"
+          f"耗时 {stats['seconds']}s，数据库位于 {os.environ['DATABASE_URL']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""负载基准：在合成场景库上压测主要路由，输出 p50 / p95 / p99 与吞吐量
+
+    python -m benchmarks.load --scenes 5000                      # Flask test client，逐个请求
+    python -m benchmarks.load --scenes 5000 --driver http -c 8   # 本进程启动多线程 HTTP 服务，8 个并发客户端
+    python -m benchmarks.load --workdir /tmp/xy-bench --reuse    # 复用 benchmarks.catalog 已生成的库
+    python -m benchmarks.load --save base.json                   # 保存结果
+    python -m benchmarks.load --baseline base.json               # 与保存的结果比较，p95 退化超过阈值时返回码为 1
+
+场景库、instance 目录与上传目录都在工作目录内（默认临时目录，结束后删除）。
+导出场景默认随机挑选场景（大库下多数未命中导出缓存），export_pdf_cached 固定同一场景，用于对比缓存命中的开销。
+"""
+import argparse
+import http.cookiejar
+import io
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from benchmarks import catalog
+
+SEARCH_TERMS = ('取款', '身份', '现金', '银行卡', '授权', '凭证', '2520', '挂失')
+
+ADMIN_LOGIN = {'username': 'admin', 'password': 'admin123', 'captcha': '9527',
+               'department': '运营管理部', 'name': '基准测试'}
+
+
+class Scenario:
+    """一个压测场景：request(rng, ctx) 返回 (method, path, form, files)"""
+
+    def __init__(self, name, request, admin=False):
+        self.name = name
+        self.request = request
+        self.admin = admin
+
+
+def _import_request(rng, ctx):
+    lines = [f'{i}. {rng.choice(catalog.ACTIONS)}' for i in range(1, rng.randint(5, 20) + 1)]
+    form = {'name': f'导入基准-{uuid.uuid4().hex[:12]}', 'category': rng.choice(catalog.CATEGORIES)}
+    return 'POST', '/admin/import_from_file', form, {'file': ('steps.txt', '\n'.join(lines).encode('utf-8'))}
+
+
+SCENARIOS = (
+    Scenario('index', lambda rng, ctx: ('GET', '/', None, None)),
+    Scenario('index_category', lambda rng, ctx: (
+        'GET', '/?' + urllib.parse.urlencode({'category': rng.choice(catalog.CATEGORIES)}), None, None)),
+    Scenario('index_search', lambda rng, ctx: (
+        'GET', '/?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)}), None, None)),
+    Scenario('view_scene', lambda rng, ctx: ('GET', f"/scene/{rng.choice(ctx['scene_ids'])}", None, None)),
+    Scenario('step_details', lambda rng, ctx: (
+        'GET', f"/get_step_details/{rng.randint(1, ctx['max_step_id'])}", None, None)),
+    Scenario('export_html', lambda rng, ctx: (
+        'GET', f"/scene/{rng.choice(ctx['scene_ids'])}/export/html", None, None)),
+    Scenario('export_pdf', lambda rng, ctx: (
+        'GET', f"/scene/{rng.choice(ctx['scene_ids'])}/export/pdf", None, None)),
+    Scenario('export_pdf_cached', lambda rng, ctx: (
+        'GET', f"/scene/{ctx['scene_ids'][0]}/export/pdf", None, None)),
+    Scenario('export_docx', lambda rng, ctx: (
+        'GET', f"/scene/{rng.choice(ctx['scene_ids'])}/export/docx", None, None)),
+    Scenario('import_from_file', _import_request, admin=True),
+)
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name, latencies, errors, wall_seconds):
+    values = sorted(latencies)
+    return {
+        'scenario': name,
+        'requests': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2) if values else 0.0,
+        'throughput_rps': round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+    }
+
+
+class ClientDriver:
+    """Flask test client，单线程逐个请求：测量应用本身的处理耗时"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def run(self, scenario, count, ctx, seed):
+        rng = random.Random(seed)
+        client = self.app.test_client()
+        if scenario.admin:
+            client.post('/login', data=ADMIN_LOGIN)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(count):
+            method, path, form, files = scenario.request(rng, ctx)
+            data = dict(form or {})
+            for field, (filename, content) in (files or {}).items():
+                data[field] = (io.BytesIO(content), filename)
+            t0 = time.perf_counter()
+            response = client.open(path, method=method, data=data or None)
+            response.get_data()
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+        return summarize(scenario.name, latencies, errors, time.perf_counter() - started)
+
+
+def _multipart(form, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for key, value in (form or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+    for key, (filename, content) in (files or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class HTTPDriver:
+    """并发 HTTP 客户端：concurrency 个线程各自持有会话，对同一服务发请求"""
+
+    def __init__(self, base_url, concurrency):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+
+    def _opener(self, admin):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        if admin:
+            body = urllib.parse.urlencode(ADMIN_LOGIN).encode()
+            opener.open(self.base_url + '/login', data=body).read()
+        return opener
+
+    def _send(self, opener, method, path, form, files):
+        data, headers = None, {}
+        if files:
+            data, headers['Content-Type'] = _multipart(form, files)
+        elif form:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with opener.open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def run(self, scenario, count, ctx, seed):
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        per_thread = [count // self.concurrency + (1 if i < count % self.concurrency else 0)
+                      for i in range(self.concurrency)]
+
+        def worker(index, n):
+            rng = random.Random(seed * 1000 + index)
+            opener = self._opener(scenario.admin)
+            local, local_errors = [], 0
+            for _ in range(n):
+                method, path, form, files = scenario.request(rng, ctx)
+                t0 = time.perf_counter()
+                status = self._send(opener, method, path, form, files)
+                local.append(time.perf_counter() - t0)
+                if status >= 400:
+                    local_errors += 1
+            with lock:
+                latencies.extend(local)
+                errors[0] += local_errors
+
+        threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread) if n]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return summarize(scenario.name, latencies, errors[0], time.perf_counter() - started)
+
+
+def start_server(app):
+    """在后台线程启动多线程 werkzeug 服务，返回 (base_url, server)"""
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def compare(results, baseline, tolerance):
+    """返回 p95 相对基线退化超过 tolerance（比例）的场景说明"""
+    previous = {r['scenario']: r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result['scenario'])
+        if not base or not base['p95_ms']:
+            continue
+        ratio = result['p95_ms'] / base['p95_ms']
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['scenario']}: p95 {base['p95_ms']}ms -> {result['p95_ms']}ms（x{ratio:.2f}）")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='在合成场景库上压测主要路由')
+    parser.add_argument('--workdir', help='工作目录（默认临时目录，结束后删除）')
+    parser.add_argument('--reuse', action='store_true', help='工作目录已有场景库时不再生成')
+    parser.add_argument('--scenes', type=int, default=1000)
+    parser.add_argument('--min-steps', type=int, default=10)
+    parser.add_argument('--max-steps', type=int, default=40)
+    parser.add_argument('--images', type=int, default=8, help='生成的不同配图数量（至少 1 张）')
+    parser.add_argument('--image-ratio', type=float, default=0.1)
+    parser.add_argument('--driver', choices=('client', 'http'), default='client')
+    parser.add_argument('--url', help='压测已运行的服务（仅 http 驱动；该服务需使用同一场景库）')
+    parser.add_argument('-c', '--concurrency', type=int, default=4)
+    parser.add_argument('-n', '--requests', type=int, default=100, help='每个场景的请求数')
+    parser.add_argument('--scenario', action='append', help='只运行指定场景（可重复）')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='结果保存为 JSON')
+    parser.add_argument('--baseline', help='与之前保存的结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='p95 允许的退化比例')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='xy-bench-')
+    catalog.use_workdir(workdir)
+    try:
+        return _run(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run(args, workdir):
+    from app import BusinessScene, SceneStep, app, db, init_db
+
+    # 应用默认 INFO 日志，压测时只保留警告（含慢请求日志）
+    level = os.environ.get('BENCH_LOG_LEVEL', 'WARNING')
+    logging.getLogger().setLevel(level)
+    logging.getLogger('werkzeug').setLevel(level)
+
+    reuse = args.reuse and os.path.exists(os.path.join(workdir, 'catalog.db'))
+    if not reuse:
+        stats = catalog.build_catalog(args.scenes, args.min_steps, args.max_steps, args.images,
+                                      args.image_ratio, args.seed, quiet=args.json)
+        if not args.json:
+            print(f"场景库：{stats['scenes']} 个场景，{stats['steps']} 个步骤，生成耗时 {stats['seconds']}s")
+    init_db()
+    with app.app_context():
+        ctx = {'scene_ids': [row[0] for row in db.session.query(BusinessScene.id).order_by(BusinessScene.id)],
+               'max_step_id': db.session.query(db.func.max(SceneStep.id)).scalar() or 1}
+
+    server = None
+    if args.driver == 'http':
+        base_url = args.url
+        if not base_url:
+            base_url, server = start_server(app)
+        driver = HTTPDriver(base_url, args.concurrency)
+    else:
+        driver = ClientDriver(app)
+
+    selected = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    results = []
+    try:
+        for scenario in selected:
+            result = driver.run(scenario, args.requests, ctx, args.seed)
+            results.append(result)
+            if not args.json:
+                print(f"{result['scenario']:<18} n={result['requests']:<5} err={result['errors']:<3} "
+                      f"p50={result['p50_ms']:>8.1f}ms p95={result['p95_ms']:>8.1f}ms "
+                      f"p99={result['p99_ms']:>8.1f}ms  {result['throughput_rps']:>7.1f} req/s")
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        'driver': args.driver,
+        'concurrency': args.concurrency if args.driver == 'http' else 1,
+        'scenes': len(ctx['scene_ids']),
+        'requests_per_scenario': args.requests,
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.json:
+        print(json.dumps(dict(report, regressions=regressions), ensure_ascii=False, indent=2))
+    else:
+        for line in regressions:
+            print(f'✗ {line}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""worker 启动开销基准：导入耗时（-X importtime）与单个 worker 常驻内存
+
+在仓库根目录运行：
+    python -m benchmarks.startup                 # 输出报告，超出 startup_budget.json 预算时返回码为 1
+    python -m benchmarks.startup --exercise      # 另外渲染一次 PDF / Word 导出，显示按需加载的开销
+    python -m benchmarks.startup --json          # 输出 JSON，便于记录历史数据
+
+每项测量都在新的子进程中进行，数据库、instance 目录与上传目录都指向临时目录，不影响正式数据。
+- 导入耗时：python -X importtime -c "import app"，汇总各模块 self 时间，并列出 app 直接导入的最慢模块；
+- worker 内存：先在单独的子进程中初始化数据库（相当于 gunicorn 主进程的 on_starting），再在新的子进程中执行
+  与 wsgi.py 相同的 import app + init_worker()（即一个 gunicorn worker 启动后的状态），
+  读取常驻内存（RSS）与峰值，并检查 reportlab / python-docx / pdfplumber 等重型库没有在启动时加载。
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+
+# 子进程：模拟一个 worker 启动，可选渲染一次导出，输出 JSON
+_WORKER_SCRIPT = r'''
+import json, os, resource, sys, time
+started = time.perf_counter()
+from app import app, init_worker
+init_worker()
+boot_seconds = time.perf_counter() - started
+
+def rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def peak_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+result = {'boot_seconds': boot_seconds, 'rss_kb': rss_kb(), 'peak_rss_kb': peak_kb(),
+          'modules': sorted(m for m in sys.modules if '.' not in m)}
+if os.environ.get('BENCH_EXERCISE'):
+    client = app.test_client()
+    with app.app_context():
+        from app import BusinessScene
+        scene_id = BusinessScene.query.first().id
+    started = time.perf_counter()
+    for fmt in ('pdf', 'docx'):
+        assert client.get(f'/scene/{scene_id}/export/{fmt}').status_code == 200
+    result['export_seconds'] = time.perf_counter() - started
+    result['rss_after_export_kb'] = rss_kb()
+print(json.dumps(result))
+sys.stdout.flush()
+os._exit(0)
+'''
+
+
+def _env(tmpdir, **extra):
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f'sqlite:///{os.path.join(tmpdir, "bench.db")}'
+    env['INSTANCE_DIR'] = os.path.join(tmpdir, 'instance')
+    env['UPLOAD_FOLDER'] = os.path.join(tmpdir, 'uploads')
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env.update(extra)
+    return env
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 (总耗时微秒, [(app 直接导入的模块, 累计微秒)])"""
+    total = 0
+    direct = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        total += int(self_us)
+        # 名称前先有一个空格，之后每层嵌套缩进两格；第 1 层即 app 直接导入的模块
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            direct.append((name.strip(), int(cumulative_us)))
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return total, direct
+
+
+def measure_import(tmpdir):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                          env=_env(tmpdir), capture_output=True, text=True, check=True)
+    return parse_importtime(proc.stderr)
+
+
+def measure_worker(tmpdir, exercise=False):
+    subprocess.run([sys.executable, '-c', 'from app import setup_database; setup_database()'], cwd=ROOT,
+                   env=_env(tmpdir), capture_output=True, check=True)
+    extra = {'BENCH_EXERCISE': '1'} if exercise else {}
+    proc = subprocess.run([sys.executable, '-c', _WORKER_SCRIPT], cwd=ROOT, env=_env(tmpdir, **extra),
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def check_budget(report, budget):
+    """返回超出预算的项目说明列表"""
+    failures = []
+    if report['import_ms'] > budget.get('import_ms', float('inf')):
+        failures.append(f"导入耗时 {report['import_ms']:.0f}ms 超出预算 {budget['import_ms']}ms")
+    if report['worker_rss_mb'] > budget.get('worker_rss_mb', float('inf')):
+        failures.append(f"worker 内存 {report['worker_rss_mb']:.1f}MB 超出预算 {budget['worker_rss_mb']}MB")
+    loaded = sorted(set(budget.get('forbidden_modules', [])) & set(report['modules']))
+    if loaded:
+        failures.append(f"启动时加载了应按需导入的模块: {', '.join(loaded)}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='worker 启动导入耗时与内存基准')
+    parser.add_argument('--runs', type=int, default=3, help='导入耗时测量次数，取最小值')
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help='预算文件路径')
+    parser.add_argument('--exercise', action='store_true', help='启动后渲染一次 PDF / Word 导出')
+    parser.add_argument('--top', type=int, default=10, help='列出 app 直接导入的最慢模块数量')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        runs = [measure_import(tmpdir) for _ in range(max(1, args.runs))]
+        total_us, direct = min(runs, key=lambda r: r[0])
+        worker = measure_worker(tmpdir, exercise=args.exercise)
+
+    report = {
+        'import_ms': total_us / 1000,
+        'slowest_imports': [{'module': name, 'ms': us / 1000} for name, us in direct[:args.top]],
+        'boot_ms': worker['boot_seconds'] * 1000,
+        'worker_rss_mb': worker['rss_kb'] / 1024,
+        'worker_peak_rss_mb': worker['peak_rss_kb'] / 1024,
+        'modules': worker['modules'],
+    }
+    if args.exercise:
+        report['export_ms'] = worker['export_seconds'] * 1000
+        report['rss_after_export_mb'] = worker['rss_after_export_kb'] / 1024
+
+    with open(args.budget, encoding='utf-8') as f:
+        budget = json.load(f)
+    failures = check_budget(report, budget)
+
+    if args.json:
+        print(json.dumps(dict(report, budget=budget, failures=failures), ensure_ascii=False, indent=2))
+    else:
+        print(f"导入 app 耗时: {report['import_ms']:.0f}ms（{args.runs} 次取最小，预算 {budget.get('import_ms')}ms）")
+        print('app 直接导入的最慢模块（含其依赖）:')
+        for item in report['slowest_imports']:
+            print(f"  {item['ms']:8.1f}ms  {item['module']}")
+        print(f"worker 启动（import app + init_worker）: {report['boot_ms']:.0f}ms")
+        print(f"worker 常驻内存: {report['worker_rss_mb']:.1f}MB（峰值 {report['worker_peak_rss_mb']:.1f}MB，"
+              f"预算 {budget.get('worker_rss_mb')}MB）")
+        if args.exercise:
+            print(f"首次 PDF + Word 导出: {report['export_ms']:.0f}ms，"
+                  f"之后常驻内存 {report['rss_after_export_mb']:.1f}MB")
+        for failure in failures:
+            print(f'✗ {failure}')
+        if not failures:
+            print('✓ 未超出预算')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
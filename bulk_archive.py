@@ -0,0 +1,391 @@
+"""场景批量导入 / 导出（归档格式）
+
+归档为 ZIP：
+  scenes.jsonl    每行一个场景，步骤内嵌；步骤配图以 images/<文件名> 引用
+  images/<文件名>  被引用的步骤配图原图
+  manifest.json   {"format": "xyassistant-scenes", "version": 1, "scenes": 场景数, "exported_at": ...}
+也可只导出 / 导入 scenes.jsonl（不含图片，步骤保留原图片地址）。
+
+导出按 id 键集分批查询、边查边写，ZIP 以流的方式输出，不落临时文件也不整体缓存在内存。
+导入先解析并校验全部记录，用一次集合查询找出已存在的场景名（跳过），再按批执行
+INSERT ... RETURNING 批量写入场景与步骤，每批提交一次；dry_run 只校验并给出报告，不写库。
+配图格式按内容识别，与归档内的文件名（扩展名）无关；dry_run 同样读取并识别每张配图，报告与实际导入一致。
+"""
+import io
+import json
+import os
+import time
+import zipfile
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+
+import change_bus
+import image_pipeline
+import search_index
+from step_notes import compute_step_notes, dump_notes, NOTES_VERSION
+
+ARCHIVE_FORMAT = 'xyassistant-scenes'
+ARCHIVE_VERSION = 1
+SCENES_FILE = 'scenes.jsonl'
+MANIFEST_FILE = 'manifest.json'
+IMAGE_DIR = 'images/'
+
+# 与模型字段长度一致，导入前校验，避免写到一半才被数据库拒绝
+_SCENE_LIMITS = {'name': 100, 'category': 50, 'creator_department': 50, 'creator_name': 50}
+_STEP_LIMITS = {'transaction_code': 20, 'condition': 100}
+_STEP_FIELDS = ('description', 'transaction_code', 'details', 'condition')
+# SQLite 单条语句参数个数有上限，名称查询按此分段
+_NAME_QUERY_CHUNK = 1000
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class _ChunkBuffer:
+    """只追加的写入目标：ZipFile 写入后由生成器取走已产生的字节"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_scenes(scene_model, query=None, batch_size=200):
+    """按 id 分批遍历场景（预加载步骤），内存占用与场景总数无关"""
+    query = query if query is not None else scene_model.query
+    last_id = 0
+    while True:
+        batch = (query.filter(scene_model.id > last_id)
+                 .options(selectinload(scene_model.steps))
+                 .order_by(scene_model.id)
+                 .limit(batch_size)
+                 .all())
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1].id
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def scene_record(scene):
+    return {
+        'name': scene.name,
+        'description': scene.description,
+        'category': scene.category,
+        'creator_department': scene.creator_department,
+        'creator_name': scene.creator_name,
+        'created_at': _iso(scene.created_at),
+        'updated_at': _iso(scene.updated_at),
+        'steps': [{
+            'step_number': step.step_number,
+            'description': step.description,
+            'transaction_code': step.transaction_code,
+            'details': step.details,
+            'condition': step.condition,
+            'image_url': step.image_url,
+        } for step in sorted(scene.steps, key=lambda s: s.step_number)],
+    }
+
+
+def _json_line(record):
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def iter_export_jsonl(scenes):
+    for scene in scenes:
+        yield _json_line(scene_record(scene))
+
+
+def iter_export_zip(scenes, upload_folder):
+    """流式生成 ZIP 归档的字节块"""
+    buffer = _ChunkBuffer()
+    images = {}
+    count = 0
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(SCENES_FILE, 'w', force_zip64=True) as f:
+            for scene in scenes:
+                record = scene_record(scene)
+                for step in record['steps']:
+                    filename = os.path.basename(step['image_url'] or '')
+                    path = os.path.join(upload_folder, filename) if filename else None
+                    if path and os.path.isfile(path):
+                        images[filename] = path
+                        step['image'] = IMAGE_DIR + filename
+                f.write(_json_line(record))
+                count += 1
+                data = buffer.drain()
+                if data:
+                    yield data
+        for filename, path in images.items():
+            zf.write(path, IMAGE_DIR + filename, compress_type=zipfile.ZIP_STORED)
+            yield buffer.drain()
+        zf.writestr(MANIFEST_FILE, json.dumps({
+            'format': ARCHIVE_FORMAT,
+            'version': ARCHIVE_VERSION,
+            'scenes': count,
+            'images': len(images),
+            'exported_at': datetime.utcnow().isoformat(),
+        }, ensure_ascii=False))
+    yield buffer.drain()
+
+
+class Archive:
+    """已打开的归档：records 为 [(行号, dict)]，read_image 按归档内路径读取图片"""
+
+    def __init__(self, records, zf=None):
+        self.records = records
+        self._zf = zf
+
+    def read_image(self, name):
+        if self._zf is None:
+            return None
+        try:
+            return self._zf.read(name)
+        except KeyError:
+            return None
+
+    def close(self):
+        if self._zf is not None:
+            self._zf.close()
+
+
+def _parse_lines(stream):
+    records = []
+    for line_no, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records.append((line_no, json.loads(line)))
+        except ValueError as e:
+            records.append((line_no, ArchiveError(f'JSON 格式错误：{e}')))
+    return records
+
+
+def open_archive(fileobj, filename):
+    """打开上传的 .zip / .jsonl 归档"""
+    if filename.lower().endswith('.jsonl'):
+        return Archive(_parse_lines(fileobj))
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ArchiveError('不是有效的 ZIP 归档')
+    try:
+        manifest = json.loads(zf.read(MANIFEST_FILE)) if MANIFEST_FILE in zf.namelist() else {}
+        if manifest and (manifest.get('format') != ARCHIVE_FORMAT or manifest.get('version', 0) > ARCHIVE_VERSION):
+            raise ArchiveError('归档格式或版本不受支持')
+        with zf.open(SCENES_FILE) as f:
+            records = _parse_lines(f)
+    except KeyError:
+        zf.close()
+        raise ArchiveError(f'归档中缺少 {SCENES_FILE}')
+    except ArchiveError:
+        zf.close()
+        raise
+    return Archive(records, zf)
+
+
+def _text(value, field, limit=None, required=False):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ArchiveError(f'缺少 {field}')
+        return None
+    if not isinstance(value, str):
+        raise ArchiveError(f'{field} 必须为字符串')
+    value = value.strip()
+    if limit and len(value) > limit:
+        raise ArchiveError(f'{field} 超过 {limit} 个字符')
+    return value
+
+
+def _datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ArchiveError(f'时间格式错误：{value}')
+
+
+def validate_record(record):
+    """校验并规范化一条场景记录，不合法时抛出 ArchiveError"""
+    if isinstance(record, ArchiveError):
+        raise record
+    if not isinstance(record, dict):
+        raise ArchiveError('记录必须为 JSON 对象')
+    scene = {field: _text(record.get(field), field, limit, required=field in ('name', 'category'))
+             for field, limit in _SCENE_LIMITS.items()}
+    scene['description'] = _text(record.get('description'), 'description') or scene['name']
+    scene['created_at'] = _datetime(record.get('created_at'))
+    steps = record.get('steps') or []
+    if not isinstance(steps, list):
+        raise ArchiveError('steps 必须为数组')
+    scene['steps'] = []
+    numbers = set()
+    for index, raw in enumerate(steps, 1):
+        if not isinstance(raw, dict):
+            raise ArchiveError(f'第 {index} 个步骤必须为 JSON 对象')
+        step = {field: _text(raw.get(field), field, _STEP_LIMITS.get(field), required=field == 'description')
+                for field in _STEP_FIELDS}
+        number = raw.get('step_number', index)
+        if not isinstance(number, int) or number < 1 or number in numbers:
+            raise ArchiveError(f'第 {index} 个步骤的 step_number 无效或重复')
+        numbers.add(number)
+        step['step_number'] = number
+        step['image'] = raw.get('image')
+        step['image_url'] = _text(raw.get('image_url'), 'image_url', 255)
+        scene['steps'].append(step)
+    return scene
+
+
+def _existing_names(session, scene_model, names):
+    existing = set()
+    names = list(names)
+    for i in range(0, len(names), _NAME_QUERY_CHUNK):
+        chunk = names[i:i + _NAME_QUERY_CHUNK]
+        existing.update(session.scalars(select(scene_model.name).where(scene_model.name.in_(chunk))))
+    return existing
+
+
+def import_archive(session, scene_model, step_model, archive, upload_folder, upload_url_prefix,
+                   dry_run=False, batch_size=200, creator_department=None, creator_name=None):
+    """导入归档中的场景，返回报告 dict；已存在的场景名跳过，不合法的记录列入 errors"""
+    started = time.perf_counter()
+    report = {'dry_run': dry_run, 'records': len(archive.records), 'scenes': 0, 'steps': 0, 'images': 0,
+              'skipped': [], 'errors': [], 'missing_images': []}
+
+    valid = []
+    seen = set()
+    for line_no, record in archive.records:
+        try:
+            scene = validate_record(record)
+        except ArchiveError as e:
+            report['errors'].append({'line': line_no, 'error': str(e)})
+            continue
+        if scene['name'] in seen:
+            report['errors'].append({'line': line_no, 'error': f"归档内场景名重复：{scene['name']}"})
+            continue
+        seen.add(scene['name'])
+        valid.append(scene)
+
+    existing = _existing_names(session, scene_model, seen)
+    pending = []
+    for scene in valid:
+        if scene['name'] in existing:
+            report['skipped'].append(scene['name'])
+        else:
+            pending.append(scene)
+
+    if dry_run:
+        report['scenes'] = len(pending)
+        report['steps'] = sum(len(scene['steps']) for scene in pending)
+        images = {step['image'] for scene in pending for step in scene['steps'] if step['image']}
+        for name in sorted(images):
+            data = archive.read_image(name)
+            try:
+                if data is None:
+                    raise ValueError('归档中缺少该文件')
+                image_pipeline.detect_format(data)
+            except ValueError as e:
+                report['missing_images'].append(f'{name}（{e}）')
+        report['images'] = len(images) - len(report['missing_images'])
+        return _finish(report, started)
+
+    stored_images = {}
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        for scene in batch:
+            for step in scene['steps']:
+                if step['image']:
+                    step['image_url'] = _store_image(archive, step['image'], upload_folder, upload_url_prefix,
+                                                     stored_images, report) or step['image_url']
+
+        now = datetime.utcnow()
+        scene_rows = [{
+            'name': scene['name'],
+            'description': scene['description'],
+            'category': scene['category'],
+            'creator_department': scene['creator_department'] or creator_department,
+            'creator_name': scene['creator_name'] or creator_name,
+            'updater_department': creator_department,
+            'updater_name': creator_name,
+            'created_at': scene['created_at'] or now,
+            'updated_at': now,
+        } for scene in batch]
+        ids = session.scalars(insert(scene_model).returning(scene_model.id, sort_by_parameter_order=True),
+                              scene_rows).all()
+
+        # ORM 批量插入不触发 before_insert 事件，注意事项在此直接计算
+        step_rows = [{
+            'scene_id': scene_id,
+            'step_number': step['step_number'],
+            'description': step['description'],
+            'transaction_code': step['transaction_code'],
+            'details': step['details'],
+            'condition': step['condition'],
+            'image_url': step['image_url'],
+            'notes': dump_notes(compute_step_notes(step['description'])),
+            'notes_version': NOTES_VERSION,
+        } for scene_id, scene in zip(ids, batch) for step in scene['steps']]
+        if step_rows:
+            session.execute(insert(step_model), step_rows)
+        for scene_id in ids:
+            search_index.index_scene(session, scene_id)
+        # 批量 INSERT 绕过 ORM 工作单元，变更日志在此显式写入
+        change_bus.record_changes(session, [
+            change_bus.Change(change_bus.SCENE, scene_id, scene_id, change_bus.CREATED) for scene_id in ids])
+        session.commit()
+        report['scenes'] += len(batch)
+        report['steps'] += len(step_rows)
+
+    report['images'] = sum(1 for url in stored_images.values() if url)
+    return _finish(report, started)
+
+
+def _store_image(archive, name, upload_folder, upload_url_prefix, stored, report):
+    if name in stored:
+        return stored[name]
+    data = archive.read_image(name)
+    if data is None:
+        report['missing_images'].append(f'{name}（归档中缺少该文件）')
+        stored[name] = None
+        return None
+    # 同一系统导出再导入时图片已在本地（文件名即内容摘要），内容相同直接复用
+    local = os.path.join(upload_folder, os.path.basename(name))
+    if os.path.isfile(local) and os.path.getsize(local) == len(data):
+        with open(local, 'rb') as f:
+            if f.read() == data:
+                stored[name] = f"{upload_url_prefix.rstrip('/')}/{os.path.basename(name)}"
+                return stored[name]
+    try:
+        filename = image_pipeline.process_upload(data, upload_folder)
+    except Exception as e:
+        report['missing_images'].append(f'{name}（{e}）')
+        stored[name] = None
+        return None
+    stored[name] = f"{upload_url_prefix.rstrip('/')}/{filename}"
+    return stored[name]
+
+
+def _finish(report, started):
+    seconds = time.perf_counter() - started
+    report['seconds'] = round(seconds, 3)
+    report['scenes_per_second'] = round(report['scenes'] / seconds, 1) if seconds else None
+    report['steps_per_second'] = round(report['steps'] / seconds, 1) if seconds else None
+    return report
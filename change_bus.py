@@ -0,0 +1,327 @@
+"""场景库变更通知：跨 worker / 跨节点的缓存失效
+
+多个 gunicorn worker（以及多台应用节点）各自持有进程内缓存，某个 worker 提交的修改需要通知到其他进程。
+
+- 变更日志：每次提交对 BusinessScene / SceneStep 的增删改都会在同一事务中写入 catalog_change 表，
+  自增 id 即场景库版本号，单调递增（PostgreSQL 上写日志前取 advisory lock，保证提交顺序与 id 顺序一致）。
+  ORM 工作单元中的修改由 after_flush 事件自动记录；绕过工作单元的批量 INSERT 需调用 record_changes()。
+- 轮询：各 worker 在处理请求前（最多每 poll_interval 秒一次）按主键查询新版本的日志，分发给订阅者；
+  本进程提交的修改在提交后立即分发，不必等待轮询。订阅者需幂等，同一修改可能收到两次。
+- 通知后端（可选）：配置 Redis 时提交后发布一条消息，其他 worker 收到后在下一个请求前立即轮询，
+  轮询间隔可相应放宽。LocalBackend 为单进程替身，接口相同。
+
+变更日志同时是场景库的修改审计记录：每行记录修改人（changed_by），一次修改中每个实体只记一行。
+编辑场景时由调用方写入带 detail 的场景记录（步骤级明细：新增、修改了哪些字段、删除、改编号的步骤），
+先用 replace_auto() 声明，自动记录随即跳过该场景行；改编号时临时负数编号的中间 flush 放在 unrecorded() 内，
+不写日志。清理日志（prune）即清理审计记录。
+
+订阅者签名为 callback(scene_ids)：scene_ids 为变更涉及的场景 id 集合，为 None 时表示变更过多、日志不连续
+或记录了全库变更（entity='catalog'，如注意事项规则升级后批量重算），应整体清空缓存。
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+CHANGE_TABLE = 'catalog_change'
+# 任意固定值，仅用于 PostgreSQL advisory lock（与 migrations 的锁区分）
+_LOCK_KEY = 7215002
+# 单次轮询最多读取的日志行数；超过时按整体失效处理
+POLL_LIMIT = 5000
+SCENE = 'scene'
+STEP = 'step'
+# 全库变更：不逐行记录，订阅者整体清空缓存，同步客户端重新全量同步
+CATALOG = 'catalog'
+CREATED, UPDATED, DELETED = 'created', 'updated', 'deleted'
+
+# detail 为可选的变更明细（可 JSON 序列化），写入日志供审计
+Change = namedtuple('Change', 'entity entity_id scene_id op detail', defaults=(None,))
+
+_metadata = sa.MetaData()
+catalog_change = sa.Table(
+    CHANGE_TABLE, _metadata,
+    sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+    sa.Column('entity', sa.String(10), nullable=False),
+    sa.Column('entity_id', sa.Integer, nullable=False),
+    sa.Column('scene_id', sa.Integer, nullable=False),
+    sa.Column('op', sa.String(10), nullable=False),
+    sa.Column('changed_at', sa.DateTime, nullable=False),
+    sa.Column('changed_by', sa.String(100)),
+    sa.Column('detail', sa.Text),
+)
+
+
+def record_changes(session, changes, changed_by=None):
+    """在 session 的当前事务中写入变更日志（changed_by 为修改人），提交后分发给本进程的订阅者"""
+    if not changes:
+        return
+    # 显式按写语句取连接：读写分离的 session 在 reading() 内也不会路由到只读引擎
+    conn = session.connection(bind_arguments={'clause': catalog_change.insert()})
+    if conn.dialect.name == 'postgresql':
+        conn.execute(sa.text('SELECT pg_advisory_xact_lock(:key)'), {'key': _LOCK_KEY})
+    now = datetime.utcnow()
+    conn.execute(catalog_change.insert(), [
+        {'entity': c.entity, 'entity_id': c.entity_id, 'scene_id': c.scene_id, 'op': c.op, 'changed_at': now,
+         'changed_by': changed_by,
+         'detail': json.dumps(c.detail, ensure_ascii=False) if c.detail is not None else None}
+        for c in changes])
+    session.info.setdefault('catalog_changes', []).extend(changes)
+
+
+def replace_auto(session, entity, entity_id):
+    """声明本事务中该实体的修改由调用方显式写入（带明细），after_flush 不再自动记录"""
+    session.info.setdefault('catalog_replaced', set()).add((entity, entity_id))
+
+
+@contextmanager
+def unrecorded(session):
+    """块内的 flush 只是中间状态（如改编号时的临时负数编号），不写变更日志；最终状态由之后的 flush 记录"""
+    session.info['catalog_unrecorded'] = True
+    try:
+        yield
+    finally:
+        session.info.pop('catalog_unrecorded', None)
+
+
+def catalog_wide_change():
+    return Change(CATALOG, 0, 0, UPDATED)
+
+
+def _scene_ids(changes):
+    """变更涉及的场景 id 集合；含全库变更时为 None"""
+    if any(c.entity == CATALOG for c in changes):
+        return None
+    return {c.scene_id for c in changes}
+
+
+def current_version(conn):
+    return conn.execute(sa.select(sa.func.max(catalog_change.c.id))).scalar() or 0
+
+
+def oldest_version(conn):
+    """最早保留的日志版本号；日志为空时为 None"""
+    return conn.execute(sa.select(sa.func.min(catalog_change.c.id))).scalar()
+
+
+def changes_since(conn, since, max_scenes, chunk_size=1000):
+    """按版本顺序读取 since 之后的变更，最多涉及 max_scenes 个场景
+
+    返回 (scene_ids, deleted_step_ids, version, has_more)：scene_ids 按首次变更的顺序排列，
+    version 为已读取到的最后一条日志的版本号（下次从此处继续）。
+    遇到全库变更时 scene_ids 为 None，调用方应改为全量同步。
+    """
+    scene_ids = {}
+    deleted_steps = []
+    version = since
+    while True:
+        rows = conn.execute(
+            sa.select(catalog_change.c.id, catalog_change.c.entity, catalog_change.c.entity_id,
+                      catalog_change.c.scene_id, catalog_change.c.op)
+            .where(catalog_change.c.id > version)
+            .order_by(catalog_change.c.id).limit(chunk_size)).all()
+        for row in rows:
+            if row.entity == CATALOG:
+                return None, [], row.id, False
+            if row.scene_id not in scene_ids and len(scene_ids) >= max_scenes:
+                return list(scene_ids), deleted_steps, version, True
+            scene_ids[row.scene_id] = None
+            if row.entity == STEP and row.op == DELETED:
+                deleted_steps.append(row.entity_id)
+            version = row.id
+        if len(rows) < chunk_size:
+            return list(scene_ids), deleted_steps, version, False
+
+
+def history(conn, scene_id, limit=50):
+    """场景的修改记录（最新的在前），每项为 dict，detail 已解析"""
+    rows = conn.execute(
+        sa.select(catalog_change).where(catalog_change.c.scene_id == scene_id)
+        .order_by(catalog_change.c.id.desc()).limit(limit)).mappings().all()
+    return [dict(row, detail=json.loads(row['detail']) if row['detail'] else None) for row in rows]
+
+
+def prune(conn, before):
+    """删除 before（datetime）之前的日志，始终保留最新一条以免版本号回退，返回删除的行数"""
+    latest = current_version(conn)
+    result = conn.execute(catalog_change.delete().where(catalog_change.c.changed_at < before,
+                                                         catalog_change.c.id < latest))
+    return result.rowcount
+
+
+class LocalBackend:
+    """单进程替身：publish 直接回调本进程的监听者"""
+
+    def __init__(self):
+        self._listeners = []
+
+    def publish(self):
+        for listener in self._listeners:
+            listener()
+
+    def listen(self, callback):
+        self._listeners.append(callback)
+
+
+class RedisBackend:
+    """Redis pub/sub：提交后发布通知，后台线程订阅并唤醒轮询（需安装 redis 包）"""
+
+    def __init__(self, url, channel='xyassistant:catalog'):
+        import redis  # 可选依赖，只在配置了 CHANGE_BUS_URL 时加载
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self):
+        try:
+            self._client.publish(self.channel, b'1')
+        except Exception as e:
+            # 通知失败时其他 worker 仍会按间隔轮询到
+            logger.warning(f'变更通知发布失败: {e}')
+
+    def listen(self, callback):
+        threading.Thread(target=self._listen, args=(callback,), name='change-bus-listener', daemon=True).start()
+
+    def _listen(self, callback):
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # 重新连上后可能错过了消息，先轮询一次
+                callback()
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        callback()
+            except Exception as e:
+                logger.warning(f'变更通知订阅中断，5 秒后重连: {e}')
+                time.sleep(5)
+
+
+class ChangeBus:
+    def __init__(self, backend=None, poll_interval=1.0):
+        self.backend = backend or LocalBackend()
+        self.poll_interval = poll_interval
+        self.version = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._next_poll = 0.0
+
+    def init_app(self, app, db, scene_model, step_model, engine=None, actor=None):
+        """engine 为轮询使用的引擎（可传只读引擎），默认 db.engine；actor() 返回当前修改人，写入变更日志"""
+        self.app = app
+        self.actor = actor
+        self._scene_model = scene_model
+        self._step_model = step_model
+        with app.app_context():
+            self.engine = engine or db.engine
+        event.listen(db.session, 'after_flush', self._after_flush)
+        event.listen(db.session, 'after_commit', self._after_commit)
+        event.listen(db.session, 'after_rollback', self._after_rollback)
+        self.backend.listen(self.wake)
+        app.before_request(self._before_request)
+        app.extensions['change_bus'] = self
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def wake(self):
+        """收到其他进程的通知：下一个请求前立即轮询"""
+        self._next_poll = 0.0
+
+    # ---- 记录 ----
+
+    def _after_flush(self, session, flush_context):
+        if session.info.get('catalog_unrecorded'):
+            return
+        changes = []
+        for obj in session.new:
+            change = self._describe(obj, CREATED)
+            if change:
+                changes.append(change)
+        for obj in session.dirty:
+            if session.is_modified(obj, include_collections=False):
+                change = self._describe(obj, UPDATED)
+                if change:
+                    changes.append(change)
+        for obj in session.deleted:
+            change = self._describe(obj, DELETED)
+            if change:
+                changes.append(change)
+        replaced = session.info.get('catalog_replaced')
+        if replaced:
+            changes = [c for c in changes if (c.entity, c.entity_id) not in replaced]
+        if changes:
+            record_changes(session, changes, self.actor() if self.actor else None)
+
+    def _describe(self, obj, op):
+        if isinstance(obj, self._scene_model):
+            return Change(SCENE, obj.id, obj.id, op)
+        if isinstance(obj, self._step_model):
+            return Change(STEP, obj.id, obj.scene_id, op)
+        return None
+
+    def _after_commit(self, session):
+        session.info.pop('catalog_replaced', None)
+        changes = session.info.pop('catalog_changes', None)
+        if not changes:
+            return
+        self._dispatch(_scene_ids(changes))
+        self.backend.publish()
+
+    def _after_rollback(self, session):
+        session.info.pop('catalog_replaced', None)
+        session.info.pop('catalog_changes', None)
+
+    # ---- 轮询 ----
+
+    def _before_request(self):
+        if time.monotonic() >= self._next_poll:
+            self.poll()
+
+    def poll(self):
+        """读取上次轮询之后的变更日志并分发，返回当前版本号"""
+        if not self._lock.acquire(blocking=False):
+            # 其他线程正在轮询
+            return self.version
+        try:
+            self._next_poll = time.monotonic() + self.poll_interval
+            try:
+                with self.engine.connect() as conn:
+                    if self.version is None:
+                        # 进程启动时缓存为空，从当前版本开始跟踪即可
+                        self.version = current_version(conn)
+                        return self.version
+                    rows = conn.execute(
+                        sa.select(catalog_change.c.id, catalog_change.c.entity, catalog_change.c.scene_id)
+                        .where(catalog_change.c.id > self.version)
+                        .order_by(catalog_change.c.id).limit(POLL_LIMIT)).all()
+                    if len(rows) == POLL_LIMIT:
+                        self.version = current_version(conn)
+            except sa.exc.DBAPIError as e:
+                # 迁移尚未执行（表不存在）或数据库暂时不可用，下次再试
+                logger.debug(f'变更日志轮询失败: {e}')
+                return self.version
+            if len(rows) == POLL_LIMIT:
+                self._dispatch(None)
+            elif rows:
+                self.version = rows[-1].id
+                self._dispatch(_scene_ids(rows))
+            return self.version
+        finally:
+            self._lock.release()
+
+    def _dispatch(self, scene_ids):
+        if scene_ids is not None and len(scene_ids) > POLL_LIMIT:
+            scene_ids = None
+        for callback in self._subscribers:
+            try:
+                callback(scene_ids)
+            except Exception:
+                logger.exception(f'变更订阅者 {getattr(callback, "__name__", callback)} 处理失败')
@@ -0,0 +1,173 @@
+"""SQLite 生产环境调优：连接 PRAGMA、读写连接分离与锁等待统计
+
+gunicorn 多进程同时读写同一个 SQLite 文件时，默认的 rollback journal 会让写事务阻塞所有读者，
+超过驱动默认等待时间即报 "database is locked"。这里在每个新连接上设置：
+
+- journal_mode=WAL：读者读快照，不再被写者阻塞（数据库文件级持久设置）；
+- synchronous=NORMAL：WAL 模式下只在检查点时 fsync，断电最多丢最近提交，数据库不会损坏；
+- busy_timeout：写锁被占用时等待而不是立即失败；
+- mmap_size / cache_size / temp_store：减少读路径的系统调用与临时文件。
+
+只读请求可在 reading() 上下文内执行，查询走单独的只读连接池（PRAGMA query_only），
+与写连接互不占用。锁等待情况通过 SQL 执行事件统计，供管理端查看。
+非 SQLite 数据库时不做任何设置。
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql import Select, TextClause
+
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,  # 负数单位为 KiB，约 16MB
+    'temp_store': 'MEMORY',
+}
+
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class LockMetrics:
+    """锁等待统计
+
+    SQLite 在 busy_timeout 内等待写锁的时间无法直接观测，这里把耗时超过阈值的写语句
+    计为一次“锁等待”（单条写语句本身通常在毫秒级），另统计等待超时后仍报 locked 的错误次数。
+    """
+
+    def __init__(self, threshold=0.05):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.write_seconds = 0.0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.max_write_seconds = 0.0
+        self.locked_errors = 0
+        self.read_queries = 0
+
+    def record_write(self, seconds):
+        with self._lock:
+            self.writes += 1
+            self.write_seconds += seconds
+            self.max_write_seconds = max(self.max_write_seconds, seconds)
+            if seconds >= self.threshold:
+                self.lock_waits += 1
+                self.lock_wait_seconds += seconds
+
+    def record_read(self):
+        with self._lock:
+            self.read_queries += 1
+
+    def record_locked(self):
+        with self._lock:
+            self.locked_errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'writes': self.writes,
+                'write_seconds': round(self.write_seconds, 3),
+                'max_write_seconds': round(self.max_write_seconds, 3),
+                'lock_waits': self.lock_waits,
+                'lock_wait_seconds': round(self.lock_wait_seconds, 3),
+                'lock_wait_threshold': self.threshold,
+                'locked_errors': self.locked_errors,
+                'read_replica_queries': self.read_queries,
+            }
+
+
+class RoutingSession(Session):
+    """在 reading() 上下文内把查询路由到只读引擎；flush 与写语句始终走主引擎"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        read_engine = self.info.get('read_engine')
+        if (bind is None and read_engine is not None and not self._flushing
+                and (clause is None or isinstance(clause, (Select, TextClause)))):
+            return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class SQLiteTuning:
+    def __init__(self, pragmas=None, read_pool_size=10, lock_wait_threshold=0.05):
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.read_pool_size = read_pool_size
+        self.metrics = LockMetrics(lock_wait_threshold)
+        self.read_engine = None
+        self.enabled = False
+
+    def init_app(self, app, db):
+        with app.app_context():
+            engine = db.engine
+        if engine.dialect.name != 'sqlite' or engine.url.database in (None, '', ':memory:'):
+            return
+        self._configure(engine, journal_mode='WAL')
+        self.read_engine = create_engine(engine.url, pool_size=self.read_pool_size, max_overflow=0)
+        self._configure(self.read_engine, query_only=True)
+        self.enabled = True
+        app.extensions['sqlite_tuning'] = self
+
+    def _configure(self, engine, journal_mode=None, query_only=False):
+        pragmas = self.pragmas
+        metrics = self.metrics
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                if journal_mode:
+                    cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+                for name, value in pragmas.items():
+                    cursor.execute(f'PRAGMA {name}={value}')
+                if query_only:
+                    cursor.execute('PRAGMA query_only=ON')
+            finally:
+                cursor.close()
+
+        @event.listens_for(engine, 'handle_error')
+        def count_locked(context):
+            if 'database is locked' in str(context.original_exception):
+                metrics.record_locked()
+
+        if query_only:
+            @event.listens_for(engine, 'before_cursor_execute')
+            def count_read(conn, cursor, statement, parameters, context, executemany):
+                metrics.record_read()
+            return
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_timer(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+                conn.info['write_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def stop_timer(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop('write_started', None)
+            if started is not None:
+                metrics.record_write(time.perf_counter() - started)
+
+    def stats(self, engine=None):
+        data = {'enabled': self.enabled, 'pragmas': self.pragmas, 'metrics': self.metrics.snapshot()}
+        if self.enabled and engine is not None:
+            with engine.connect() as conn:
+                data['journal_mode'] = conn.exec_driver_sql('PRAGMA journal_mode').scalar()
+                data['wal_checkpoint'] = list(conn.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)').one())
+            data['write_pool'] = engine.pool.status()
+            data['read_pool'] = self.read_engine.pool.status()
+        return data
+
+
+@contextmanager
+def reading(session, tuning):
+    """只读请求上下文：其中的查询走只读连接池（未启用调优时不做改变）"""
+    if not tuning.enabled or session.info.get('read_engine') is not None:
+        yield
+        return
+    session.info['read_engine'] = tuning.read_engine
+    try:
+        yield
+    finally:
+        session.info.pop('read_engine', None)
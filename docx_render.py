@@ -0,0 +1,177 @@
+"""场景 Word 导出（单场景导出与合集导出共用）
+
+python-docx 导入较慢、占用内存较多，本模块只在首次导出 Word 时由 app 按需导入。
+"""
+import io
+import logging
+
+import docx
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.shared import OxmlElement, qn
+from docx.shared import Inches, Pt, RGBColor
+
+import image_pipeline
+from step_notes import RISK_NOTES
+
+logger = logging.getLogger(__name__)
+
+
+def add_scene_docx(doc, scene, upload_folder, title_level=0):
+    """把单个场景写入 Word 文档；合集导出时 title_level=1，使场景标题进入目录"""
+    # 添加标题
+    title = doc.add_heading(scene.name, level=title_level)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # 设置标题样式
+    title_run = title.runs[0]
+    title_run.font.name = '微软雅黑'
+    title_run.font.color.rgb = RGBColor(11, 61, 145)  # 深蓝色
+    
+    # 添加元信息
+    doc.add_paragraph()  # 空行
+    
+    meta_info = []
+    meta_info.append(f"描述：{scene.description}")
+    meta_info.append(f"业务分类：{scene.category}")
+    
+    if scene.creator_department or scene.creator_name or scene.created_at:
+        creator_text = f"创建：{scene.creator_department or '-'}{scene.creator_name or '-'}"
+        if scene.created_at:
+            creator_text += f" · {scene.created_at.strftime('%Y-%m-%d %H:%M')}"
+        meta_info.append(creator_text)
+    
+    if scene.updater_department or scene.updater_name or scene.updated_at:
+        updater_text = f"修改：{scene.updater_department or '-'}{scene.updater_name or '-'}"
+        if scene.updated_at:
+            updater_text += f" · {scene.updated_at.strftime('%Y-%m-%d %H:%M')}"
+        meta_info.append(updater_text)
+    
+    for meta_line in meta_info:
+        p = doc.add_paragraph(meta_line)
+        p.runs[0].font.name = '微软雅黑'
+        p.runs[0].font.size = Pt(11)
+        p.runs[0].font.color.rgb = RGBColor(102, 102, 102)  # 灰色
+    
+    # 添加操作步骤标题
+    doc.add_paragraph()  # 空行
+    steps_title = doc.add_heading('操作步骤', level=title_level + 1)
+    steps_title_run = steps_title.runs[0]
+    steps_title_run.font.name = '微软雅黑'
+    steps_title_run.font.color.rgb = RGBColor(20, 86, 184)  # 中蓝色
+    
+    # 添加操作步骤
+    for step in sorted(scene.steps, key=lambda x: x.step_number):
+        doc.add_paragraph()  # 空行
+        
+        # 步骤标题
+        step_title = doc.add_heading(f"{step.step_number}. {step.description}", level=title_level + 2)
+        step_title_run = step_title.runs[0]
+        step_title_run.font.name = '微软雅黑'
+        step_title_run.font.color.rgb = RGBColor(47, 128, 237)  # 浅蓝色
+        
+        # 步骤详情
+        details_para = doc.add_paragraph()
+        details_run = details_para.add_run()
+        details_run.font.name = '微软雅黑'
+        details_run.font.size = Pt(11)
+        
+        details_content = []
+        if step.transaction_code:
+            details_content.append(f"交易代码：{step.transaction_code}")
+        
+        if step.details:
+            details_content.append(f"操作说明：{step.details}")
+        
+        if step.condition:
+            details_content.append(f"执行条件：{step.condition}")
+        
+        for detail in details_content:
+            details_run.add_text(detail + '\n')
+        
+        notes_para = doc.add_paragraph()
+        notes_para.add_run('注意事项：').font.name = '微软雅黑'
+        for note in step.note_list:
+            p = doc.add_paragraph()
+            p.add_run('• ').font.name = '微软雅黑'
+            p.add_run(note).font.name = '微软雅黑'
+            p.paragraph_format.left_indent = Inches(0.3)
+        
+        # 添加步骤图片（读取本地派生图，Word 中 5 英寸宽约需 1000 像素）
+        if step.image_url:
+            try:
+                img_path = image_pipeline.best_rendition_path(upload_folder, step.image_url, 1280)
+                if img_path is None:
+                    raise FileNotFoundError(step.image_url)
+                doc.add_picture(img_path, width=Inches(5))
+                last_paragraph = doc.paragraphs[-1]
+                last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            except Exception as e:
+                logger.error(f"添加图片失败: {e}")
+                # 添加错误提示文本
+                error_para = doc.add_paragraph("图片添加失败")
+                error_run = error_para.runs[0]
+                error_run.font.color.rgb = RGBColor(231, 76, 60)  # 红色
+    
+    # 添加风险提示
+    doc.add_paragraph()  # 空行
+    risk_title = doc.add_heading('风险提示', level=title_level + 1)
+    risk_title_run = risk_title.runs[0]
+    risk_title_run.font.name = '微软雅黑'
+    risk_title_run.font.color.rgb = RGBColor(231, 76, 60)  # 红色
+    
+    for note in RISK_NOTES:
+        p = doc.add_paragraph()
+        p.add_run('• ').font.name = '微软雅黑'
+        p.add_run(note).font.name = '微软雅黑'
+        p.left_indent = Inches(0.5)
+
+
+def render_scene(scene, upload_folder):
+    """渲染场景 Word 文档，返回文件字节"""
+    doc = docx.Document()
+    add_scene_docx(doc, scene, upload_folder)
+    
+    # 保存文档到内存
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def add_docx_toc(doc):
+    """插入目录域（TOC），并设置打开文档时自动更新域以生成页码"""
+    paragraph = doc.add_paragraph()
+    run = paragraph.add_run()
+    for tag, attrs, text in (('w:fldChar', {'w:fldCharType': 'begin'}, None),
+                             ('w:instrText', {'xml:space': 'preserve'}, 'TOC \\o "1-1" \\h \\z \\u'),
+                             ('w:fldChar', {'w:fldCharType': 'separate'}, None),
+                             ('w:t', {}, '（打开文档后更新域即可显示目录）'),
+                             ('w:fldChar', {'w:fldCharType': 'end'}, None)):
+        element = OxmlElement(tag)
+        for key, value in attrs.items():
+            element.set(qn(key), value)
+        if text:
+            element.text = text
+        run._r.append(element)
+    update_fields = OxmlElement('w:updateFields')
+    update_fields.set(qn('w:val'), 'true')
+    doc.settings.element.append(update_fields)
+
+
+def render_binder(scenes, title, output, upload_folder):
+    """多个场景合成一份带目录的 Word 文档，写入 output（文件对象）
+
+    scenes 可以是按批加载的迭代器；python-docx 在保存前把整个文档结构保留在内存中，规模由 BINDER_MAX_SCENES 限制。
+    """
+    doc = docx.Document()
+    heading = doc.add_heading(title, level=0)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    # 目录标题不用标题样式，避免自身进入目录
+    toc_title = doc.add_paragraph().add_run('目录')
+    toc_title.font.name = '微软雅黑'
+    toc_title.font.size = Pt(16)
+    toc_title.bold = True
+    add_docx_toc(doc)
+    for scene in scenes:
+        doc.add_page_break()
+        add_scene_docx(doc, scene, upload_folder, title_level=1)
+    doc.save(output)
@@ -0,0 +1,135 @@
+"""场景导出文件缓存（内存 LRU + 磁盘两级）
+
+缓存键由「场景 id + 更新时间 + 导出格式 + 渲染版本（含注意事项规则指纹）」计算摘要得到，场景一旦修改，
+updated_at 变化即自然落到新键上；场景库变更时（change_bus 通知，含其他 worker 的修改）再按场景 id
+主动清理，避免旧文件占用空间。
+磁盘层位于 instance/ 下，多个 gunicorn worker 共享同一份渲染结果。
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class ExportCache:
+    def __init__(self, directory, max_memory_bytes=64 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024,
+                 render_version=1):
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.render_version = render_version
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def make_key(self, scene_id, updated_at, fmt):
+        """返回缓存键，同时用作 HTTP ETag"""
+        stamp = updated_at.isoformat() if updated_at else ''
+        raw = f'{scene_id}|{stamp}|{fmt}|{self.render_version}'
+        digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+        return f'{scene_id}-{fmt}-{digest}'
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        tmp_path = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._trim_disk()
+
+    def invalidate_scene(self, scene_id):
+        """清除某个场景所有格式、所有版本的缓存"""
+        prefix = f'{scene_id}-'
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_bytes -= len(self._memory.pop(key))
+        for name in self._listdir():
+            if name.startswith(prefix):
+                self._remove(name)
+
+    def invalidate_scenes(self, scene_ids):
+        """批量清除多个场景的缓存（只遍历一次缓存目录）"""
+        prefixes = tuple(f'{scene_id}-' for scene_id in scene_ids)
+        if not prefixes:
+            return
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefixes)]:
+                self._memory_bytes -= len(self._memory.pop(key))
+        for name in self._listdir():
+            if name.startswith(prefixes):
+                self._remove(name)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for name in self._listdir():
+            self._remove(name)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _listdir(self):
+        try:
+            return [n for n in os.listdir(self.directory) if not n.endswith('.tmp')]
+        except OSError:
+            return []
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _trim_disk(self):
+        """超出磁盘上限时按最后修改时间淘汰最旧的文件"""
+        entries = []
+        total = 0
+        for name in self._listdir():
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+        if total <= self.max_disk_bytes:
+            return
+        for _, size, name in sorted(entries):
+            self._remove(name)
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
@@ -45,7 +45,7 @@ echo "Starting Gunicorn server..."
 # 停止之前可能运行的进程
 pkill -f "gunicorn.*wsgi:app" || true
 # 启动新的进程
-gunicorn --bind 0.0.0.0:5000 wsgi:app --daemon --workers 3 --timeout 300
+gunicorn -c gunicorn.conf.py --bind 0.0.0.0:5000 wsgi:app --daemon --workers 3 --timeout 300
 
 echo "Deployment completed successfully!"
 echo "Application should be running on http://103.217.187.88:5000"
\ No newline at end of file
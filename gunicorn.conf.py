@@ -0,0 +1,24 @@
+"""gunicorn 配置：gunicorn -c gunicorn.conf.py --bind 0.0.0.0:5000 wsgi:app --workers 3
+
+多个 worker 同时启动时不能各自建表、迁移和写入初始数据（会互相冲突），
+因此在主进程 fork worker 之前以独立子进程执行一次 flask db-upgrade。
+主进程本身不导入 app，避免数据库连接、后台线程被 fork 到 worker 中。
+"""
+import os
+import subprocess
+import sys
+
+
+def on_starting(server):
+    _upgrade_database(server)
+
+
+def on_reload(server):
+    # kill -HUP 重载（如 git pull 之后）时同样先执行新代码的迁移，再启动新的 worker
+    _upgrade_database(server)
+
+
+def _upgrade_database(server):
+    root = os.path.dirname(os.path.abspath(__file__))
+    server.log.info('初始化数据库（flask db-upgrade）')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db-upgrade'], cwd=root, check=True)
@@ -0,0 +1,215 @@
+"""步骤配图处理：内容去重、去除元数据、生成多尺寸派生图
+
+上传的原图按内容 SHA-256 命名、扩展名取图片实际格式（与上传文件名无关），同一张截图重复上传只保存一份；
+原图重新编码以去除 EXIF 等元数据（保留 ICC 色彩配置；CMYK、灰度等统一转为 RGB / RGBA），并按若干宽度生成 WebP 与 JPEG 派生图，存放在 uploads/r/ 下，
+另写一份清单 r/<原图名>.json 记录已生成的宽度。页面通过 srcset 让浏览器挑选合适尺寸，
+导出 PDF / Word 时取不小于目标宽度的最小派生图（Word 不支持 WebP，导出统一用 JPEG）。
+
+页面渲染只用到清单与 URL 计算，Pillow 只在处理上传、生成派生图时才导入。
+"""
+import hashlib
+import io
+import json
+import os
+from functools import lru_cache
+
+
+RENDITION_DIR = 'r'
+RENDITION_WIDTHS = (160, 320, 640, 1280)
+THUMBNAIL_WIDTH = 160
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Pillow 识别出的格式 -> 保存时使用的扩展名
+_EXTENSIONS = {'PNG': 'png', 'JPEG': 'jpg', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+def _stem(filename):
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _normalize_mode(img, icc_profile=None):
+    """统一为 RGB / RGBA，返回 (图片, 仍适用的 ICC 配置)
+
+    调色板图的配置本身就是 RGB 的，可以保留；CMYK / 灰度的配置不适用于转换后的 RGB 图，
+    有配置时先按配置转换到 sRGB，无法转换时直接转换并丢弃配置。
+    """
+    if img.mode in ('RGB', 'RGBA'):
+        return img, icc_profile
+    mode = 'RGBA' if _has_alpha(img) else 'RGB'
+    if img.mode == 'P':
+        return img.convert(mode), icc_profile
+    if icc_profile and img.mode in ('CMYK', 'L'):
+        try:
+            from PIL import ImageCms
+            source = ImageCms.ImageCmsProfile(io.BytesIO(icc_profile))
+            return ImageCms.profileToProfile(img, source, ImageCms.createProfile('sRGB'), outputMode='RGB'), None
+        except Exception:
+            pass
+    return img.convert(mode), None
+
+
+def _flatten(img):
+    """JPEG 不支持透明通道，透明区域铺白底"""
+    from PIL import Image
+    if _has_alpha(img):
+        img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, 'white')
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+    return img.convert('RGB')
+
+
+def _save_original(img, path, fmt, icc_profile):
+    params = {}
+    if icc_profile:
+        params['icc_profile'] = icc_profile
+    if fmt == 'JPEG':
+        img = _flatten(img)
+        params.update(quality=88, optimize=True, progressive=True)
+    elif fmt == 'PNG':
+        params['optimize'] = True
+    elif fmt == 'WEBP':
+        params['quality'] = 88
+    img.save(path, fmt, **params)
+
+
+def _open(data):
+    """按内容打开图片，无法识别或格式不支持时抛出 ValueError"""
+    from PIL import Image, UnidentifiedImageError
+    try:
+        img = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        raise ValueError('无法识别的图片文件')
+    if img.format not in _EXTENSIONS:
+        img.close()
+        raise ValueError(f'不支持的图片格式: {img.format}')
+    return img
+
+
+def detect_format(data):
+    """按内容识别图片格式，返回保存时使用的扩展名（只读文件头，不解码），不支持时抛出 ValueError"""
+    with _open(data) as img:
+        return _EXTENSIONS[img.format]
+
+
+def process_upload(data, upload_folder):
+    """保存一张上传图片并生成派生图，返回保存后的文件名（内容相同则复用已有文件）
+
+    格式按文件内容识别（与文件名无关），不支持的格式抛出 ValueError。
+    """
+    from PIL import ImageOps
+    with _open(data) as img:
+        fmt = img.format
+        filename = f'{hashlib.sha256(data).hexdigest()[:32]}.{_EXTENSIONS[fmt]}'
+        path = os.path.join(upload_folder, filename)
+        if os.path.exists(path) and os.path.exists(_manifest_path(upload_folder, filename)):
+            return filename
+        if getattr(img, 'is_animated', False):
+            # 动图保持原样，不做重编码与派生
+            with open(path, 'wb') as f:
+                f.write(data)
+            _write_manifest(upload_folder, filename, img.size, [])
+            return filename
+        icc_profile = img.info.get('icc_profile')
+        original = ImageOps.exif_transpose(img)
+        original.load()
+    img, icc_profile = _normalize_mode(original, icc_profile)
+    # GIF 只能保存调色板图，保持原模式（含透明色）重新编码
+    _save_original(original if fmt == 'GIF' else img, path, fmt, icc_profile)
+    build_renditions(upload_folder, filename, img)
+    return filename
+
+
+def build_renditions(upload_folder, filename, img=None):
+    """为已有图片生成派生图（也用于给历史上传补建），返回生成的宽度列表"""
+    from PIL import Image, ImageOps, features
+    if img is None:
+        with Image.open(os.path.join(upload_folder, filename)) as src:
+            if getattr(src, 'is_animated', False):
+                _write_manifest(upload_folder, filename, src.size, [])
+                return []
+            img = ImageOps.exif_transpose(src)
+            img.load()
+    img, _ = _normalize_mode(img)
+    rendition_dir = os.path.join(upload_folder, RENDITION_DIR)
+    os.makedirs(rendition_dir, exist_ok=True)
+    stem = _stem(filename)
+    webp = features.check('webp')
+    widths = []
+    for width in RENDITION_WIDTHS:
+        if width >= img.width:
+            break
+        height = max(1, round(img.height * width / img.width))
+        resized = img.resize((width, height), Image.LANCZOS)
+        _flatten(resized).save(os.path.join(rendition_dir, f'{stem}-{width}.jpg'), 'JPEG',
+                               quality=JPEG_QUALITY, optimize=True, progressive=True)
+        if webp:
+            resized.save(os.path.join(rendition_dir, f'{stem}-{width}.webp'), 'WEBP', quality=WEBP_QUALITY)
+        widths.append(width)
+    _write_manifest(upload_folder, filename, img.size, widths, webp)
+    return widths
+
+
+def _manifest_path(upload_folder, filename):
+    return os.path.join(upload_folder, RENDITION_DIR, f'{_stem(filename)}.json')
+
+
+def _write_manifest(upload_folder, filename, size, widths, webp=False):
+    os.makedirs(os.path.join(upload_folder, RENDITION_DIR), exist_ok=True)
+    manifest = {'width': size[0], 'height': size[1], 'widths': widths, 'webp': webp}
+    with open(_manifest_path(upload_folder, filename), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    load_manifest.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def load_manifest(upload_folder, filename):
+    try:
+        with open(_manifest_path(upload_folder, filename), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _rendition_url(image_url, width, ext):
+    base = image_url.rsplit('/', 1)[0]
+    return f'{base}/{RENDITION_DIR}/{_stem(image_url)}-{width}.{ext}'
+
+
+def srcset(upload_folder, image_url, fmt='jpg'):
+    """生成 <img>/<source> 的 srcset；无派生图时返回空串"""
+    if not image_url:
+        return ''
+    manifest = load_manifest(upload_folder, os.path.basename(image_url))
+    if not manifest or not manifest['widths'] or (fmt == 'webp' and not manifest.get('webp')):
+        return ''
+    entries = [f'{_rendition_url(image_url, w, fmt)} {w}w' for w in manifest['widths']]
+    if fmt == 'jpg':
+        entries.append(f"{image_url} {manifest['width']}w")
+    return ', '.join(entries)
+
+
+def thumbnail_url(upload_folder, image_url):
+    manifest = load_manifest(upload_folder, os.path.basename(image_url)) if image_url else None
+    if manifest and THUMBNAIL_WIDTH in manifest['widths']:
+        return _rendition_url(image_url, THUMBNAIL_WIDTH, 'jpg')
+    return image_url
+
+
+def best_rendition_path(upload_folder, image_url, min_width):
+    """导出用：返回宽度不小于 min_width 的最小 JPEG 派生图路径，没有则返回原图路径（不存在时为 None）"""
+    filename = os.path.basename(image_url or '')
+    original = os.path.join(upload_folder, filename)
+    if not filename or not os.path.exists(original):
+        return None
+    manifest = load_manifest(upload_folder, filename)
+    if manifest:
+        for width in manifest['widths']:
+            if width >= min_width:
+                return os.path.join(upload_folder, RENDITION_DIR, f'{_stem(filename)}-{width}.jpg')
+    return original
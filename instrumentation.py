@@ -0,0 +1,219 @@
+"""请求级性能埋点：路由耗时、SQL 次数与耗时、导出 / OCR 阶段耗时
+
+- 每个请求结束时按 endpoint 记录耗时直方图，以及该请求执行的 SQL 条数与总耗时（通过引擎
+  before/after_cursor_execute 事件统计，读写两个连接池都挂上）；
+- stage() 计时导出渲染、OCR 等阶段，在后台任务线程中同样可用；
+- /metrics 以 Prometheus 文本格式输出；
+- 超过阈值的慢请求写 WARNING 日志，附带最慢的几条 SQL 与各阶段耗时，最近若干条另保存在内存中供管理端查看。
+
+指标保存在当前进程内，gunicorn 多 worker 时每次抓取只反映其中一个 worker。
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# 慢请求日志中最多列出的 SQL 条数与每条的最大长度
+SLOW_SQL_LIMIT = 10
+SQL_TEXT_LIMIT = 500
+
+
+class Histogram:
+    """Prometheus 风格直方图，按标签值分组"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            base = _labels(self.label_names, labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base}le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{base}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base.rstrip(",")}}} {total}')
+            lines.append(f'{self.name}_count{{{base.rstrip(",")}}} {count}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = _labels(self.label_names, labels).rstrip(',')
+            lines.append(f'{self.name}{{{base}}} {value}' if base else f'{self.name} {value}')
+        return lines
+
+
+def _labels(names, values):
+    """生成 'a="x",b="y",'（末尾带逗号，便于直方图追加 le）"""
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ''.join(f'{name}="{escape(value)}",' for name, value in zip(names, values))
+
+
+class Instrumentation:
+    def __init__(self, slow_request_seconds=1.0, metrics_token=None, recent_slow_size=50):
+        self.slow_request_seconds = slow_request_seconds
+        self.metrics_token = metrics_token
+        self.recent_slow = deque(maxlen=recent_slow_size)
+        self.request_seconds = Histogram(
+            'xy_request_duration_seconds', '请求处理耗时（流式响应不含发送时间）',
+            ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'xy_request_sql_queries', '单个请求执行的 SQL 条数', ('endpoint',), QUERY_COUNT_BUCKETS)
+        self.request_sql_seconds = Histogram(
+            'xy_request_sql_seconds', '单个请求的 SQL 总耗时', ('endpoint',), LATENCY_BUCKETS)
+        self.stage_seconds = Histogram(
+            'xy_stage_duration_seconds', '导出、OCR 等阶段耗时', ('stage',), STAGE_BUCKETS)
+        self.stage_errors = Counter('xy_stage_errors_total', '阶段执行出错次数', ('stage',))
+        self.slow_requests = Counter('xy_slow_requests_total', '超过慢请求阈值的请求数', ('endpoint',))
+        self.queries_outside_request = Counter(
+            'xy_sql_queries_outside_request_total', '请求之外（后台任务、启动）执行的 SQL 条数', ())
+
+    def init_app(self, app, engines):
+        self._started = time.time()
+        for engine in engines:
+            self._instrument_engine(engine)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['instrumentation'] = self
+
+    def _instrument_engine(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def start_query(conn, cursor, statement, parameters, context, executemany):
+            conn.info['query_started'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def end_query(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info.pop('query_started', None)
+            if started is None:
+                return
+            elapsed = time.perf_counter() - started
+            if not has_request_context() or 'metrics_started' not in g:
+                self.queries_outside_request.inc(())
+                return
+            g.metrics_sql_count += 1
+            g.metrics_sql_seconds += elapsed
+            # 只保留最慢的若干条，批量写入的请求也不会积累大量语句
+            entry = (elapsed, statement)
+            if len(g.metrics_sql) < SLOW_SQL_LIMIT:
+                heapq.heappush(g.metrics_sql, entry)
+            else:
+                heapq.heappushpop(g.metrics_sql, entry)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_sql = []
+        g.metrics_stages = []
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        self.request_seconds.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        self.request_queries.observe((endpoint,), g.metrics_sql_count)
+        self.request_sql_seconds.observe((endpoint,), g.metrics_sql_seconds)
+        if elapsed >= self.slow_request_seconds:
+            self._log_slow_request(endpoint, response, elapsed)
+        return response
+
+    def _log_slow_request(self, endpoint, response, elapsed):
+        self.slow_requests.inc((endpoint,))
+        slowest = sorted(g.metrics_sql, key=lambda item: item[0], reverse=True)[:SLOW_SQL_LIMIT]
+        record = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'seconds': round(elapsed, 3),
+            'sql_count': g.metrics_sql_count,
+            'sql_seconds': round(g.metrics_sql_seconds, 3),
+            'stages': [{'stage': name, 'seconds': round(seconds, 3)} for name, seconds in g.metrics_stages],
+            'slowest_sql': [{'seconds': round(seconds, 4), 'sql': ' '.join(sql.split())[:SQL_TEXT_LIMIT]}
+                            for seconds, sql in slowest],
+        }
+        self.recent_slow.append(record)
+        sql_lines = ''.join(f"\n  {q['seconds']:.4f}s {q['sql']}" for q in record['slowest_sql'])
+        stage_text = ', '.join(f"{s['stage']}={s['seconds']}s" for s in record['stages']) or '-'
+        logger.warning(f"慢请求 {record['method']} {record['path']} ({endpoint}) 耗时 {record['seconds']}s，"
+                       f"SQL {record['sql_count']} 条共 {record['sql_seconds']}s，阶段 {stage_text}{sql_lines}")
+
+    @contextmanager
+    def stage(self, name):
+        """阶段计时；在请求内时同时记入该请求的慢请求日志"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.stage_errors.inc((name,))
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stage_seconds.observe((name,), elapsed)
+            if has_request_context() and 'metrics_stages' in g:
+                g.metrics_stages.append((name, elapsed))
+
+    def render(self):
+        lines = ['# HELP xy_process_start_time_seconds 进程启动时间（Unix 时间戳）',
+                 '# TYPE xy_process_start_time_seconds gauge',
+                 f'xy_process_start_time_seconds {self._started}']
+        for metric in (self.request_seconds, self.request_queries, self.request_sql_seconds,
+                       self.stage_seconds, self.stage_errors, self.slow_requests,
+                       self.queries_outside_request):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        """Prometheus 抓取接口；配置了令牌时需携带 Authorization: Bearer <令牌>"""
+        if self.metrics_token and request.headers.get('Authorization') != f'Bearer {self.metrics_token}':
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
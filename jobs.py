@@ -0,0 +1,190 @@
+"""后台任务队列（OCR / PDF 导入等耗时操作）
+
+任务持久化在与业务相同的数据库中（ImportJob 表），由进程内的工作线程池执行：
+- 领取任务使用带状态条件的 UPDATE，多个 gunicorn worker 同时轮询也不会重复执行；
+- 失败的任务按指数退避重试，超过最大次数后标记为 failed；
+- 运行中任务定期刷新 updated_at 作为心跳，进程崩溃遗留的任务超时后重新排队。
+"""
+import json
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class JobError(Exception):
+    """不可重试的任务错误（如文件格式不支持、同名场景已存在），直接标记失败"""
+
+
+class JobContext:
+    """传给任务处理函数的上下文，用于上报进度"""
+
+    def __init__(self, queue, job_id, attempt):
+        self._queue = queue
+        self.job_id = job_id
+        self.attempt = attempt
+
+    def report(self, progress, message=None):
+        self._queue._update(self.job_id, progress=max(0, min(100, int(progress))), message=message)
+
+
+class JobQueue:
+    def __init__(self, app, db, model, workers=2, poll_interval=2.0, retry_delay=5.0, stale_after=600):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.stale_after = stale_after
+        self._handlers = {}
+        self._finalizers = {}
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._start_lock = threading.Lock()
+
+    def register(self, kind, handler, on_finish=None):
+        """注册任务处理函数 handler(ctx, payload) -> dict；on_finish(payload) 在任务终结后调用"""
+        self._handlers[kind] = handler
+        if on_finish:
+            self._finalizers[kind] = on_finish
+
+    def kinds(self):
+        """已注册的任务类型"""
+        return list(self._handlers)
+
+    def submit(self, kind, payload, max_attempts=3):
+        job = self.model(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            status=PENDING,
+            payload=json.dumps(payload, ensure_ascii=False),
+            max_attempts=max_attempts,
+            progress=0,
+            message='排队中',
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        self.start()
+        self._wakeup.set()
+        return job.id
+
+    def get(self, job_id):
+        job = self.db.session.get(self.model, job_id)
+        if job is None:
+            return None
+        return {
+            'id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'progress': job.progress,
+            'message': job.message,
+            'attempts': job.attempts,
+            'max_attempts': job.max_attempts,
+            'result': json.loads(job.result) if job.result else None,
+            'error': job.error,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+        }
+
+    def start(self):
+        """启动工作线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self._threads:
+                return
+            with self.app.app_context():
+                self._requeue_stale()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _requeue_stale(self):
+        deadline = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        Job = self.model
+        count = Job.query.filter(Job.status == RUNNING, Job.updated_at < deadline).update(
+            {'status': PENDING, 'message': '任务中断，重新排队'}, synchronize_session=False)
+        self.db.session.commit()
+        if count:
+            logger.warning(f'{count} 个中断的后台任务已重新排队')
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    claimed = self._claim()
+                    if claimed is None:
+                        self.db.session.remove()
+                    else:
+                        self._execute(*claimed)
+                        continue
+            except Exception:
+                logger.exception('后台任务线程异常')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        Job = self.model
+        now = datetime.utcnow()
+        candidates = (Job.query
+                      .filter(Job.status == PENDING, self.db.or_(Job.run_after.is_(None), Job.run_after <= now))
+                      .order_by(Job.created_at)
+                      .limit(5)
+                      .all())
+        for job in candidates:
+            count = Job.query.filter(Job.id == job.id, Job.status == PENDING).update(
+                {'status': RUNNING, 'attempts': Job.attempts + 1, 'message': '处理中', 'updated_at': now},
+                synchronize_session=False)
+            self.db.session.commit()
+            if count == 1:
+                self.db.session.refresh(job)
+                return job.id, job.kind, json.loads(job.payload or '{}'), job.attempts, job.max_attempts
+        return None
+
+    def _execute(self, job_id, kind, payload, attempt, max_attempts):
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                raise JobError(f'未知任务类型: {kind}')
+            result = handler(JobContext(self, job_id, attempt), payload)
+        except Exception as e:
+            self.db.session.rollback()
+            retry = not isinstance(e, JobError) and attempt < max_attempts
+            if isinstance(e, JobError):
+                logger.error(f'后台任务 {job_id} 执行失败: {e}')
+            else:
+                logger.exception(f'后台任务 {job_id} 第 {attempt} 次执行失败')
+            if retry:
+                delay = self.retry_delay * (2 ** (attempt - 1))
+                self._update(job_id, status=PENDING, message=f'执行失败，{int(delay)} 秒后重试',
+                             error=str(e), run_after=datetime.utcnow() + timedelta(seconds=delay))
+            else:
+                self._update(job_id, status=FAILED, message='执行失败', error=str(e))
+                self._finish(kind, payload)
+            return
+        self._update(job_id, status=SUCCEEDED, progress=100, message='已完成', error=None,
+                     result=json.dumps(result or {}, ensure_ascii=False))
+        self._finish(kind, payload)
+
+    def _finish(self, kind, payload):
+        finalizer = self._finalizers.get(kind)
+        if finalizer is None:
+            return
+        try:
+            finalizer(payload)
+        except Exception:
+            logger.exception(f'任务收尾失败: {kind}')
+
+    def _update(self, job_id, **fields):
+        # 使用独立连接写状态，不影响处理函数自身会话中的未提交数据
+        fields['updated_at'] = datetime.utcnow()
+        table = self.model.__table__
+        with self.db.engine.begin() as conn:
+            conn.execute(table.update().where(table.c.id == job_id).values(**fields))
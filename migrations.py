@@ -0,0 +1,103 @@
+"""数据库结构版本迁移
+
+取代原先只适用于 SQLite 的 PRAGMA table_info + ALTER TABLE 补列：每个迁移带一个递增版本号，
+已执行的版本记录在 schema_version 表中，启动时只执行尚未执行的迁移。
+列是否存在通过 SQLAlchemy Inspector 判断、列类型按当前方言编译，SQLite 与 PostgreSQL 通用。
+
+补列类迁移都是幂等的（列已存在则跳过）：新库由 create_all 建出完整结构后，迁移只登记版本号；
+老库在旧版本代码里已补过的列也不会重复添加。PostgreSQL 上整个升级在一个事务中执行，
+并以 advisory lock 串行化，多台应用节点同时启动时只有一台真正执行迁移。
+"""
+from collections import namedtuple
+from datetime import datetime
+
+import sqlalchemy as sa
+
+import change_bus
+
+SCHEMA_TABLE = 'schema_version'
+# 任意固定值，仅用于 PostgreSQL advisory lock
+_LOCK_KEY = 7215001
+
+Migration = namedtuple('Migration', 'version description upgrade')
+
+MIGRATIONS = []
+
+_metadata = sa.MetaData()
+schema_version = sa.Table(
+    SCHEMA_TABLE, _metadata,
+    sa.Column('version', sa.Integer, primary_key=True, autoincrement=False),
+    sa.Column('description', sa.String(200)),
+    sa.Column('applied_at', sa.DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    def decorator(fn):
+        MIGRATIONS.append(Migration(version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return decorator
+
+
+def add_column(conn, table, column):
+    """表中不存在该列时添加，返回是否实际添加"""
+    existing = {c['name'] for c in sa.inspect(conn).get_columns(table)}
+    if column.name in existing:
+        return False
+    quote = conn.dialect.identifier_preparer.quote
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(sa.text(f'ALTER TABLE {quote(table)} ADD COLUMN {quote(column.name)} {column_type}'))
+    return True
+
+
+@migration(1, '业务场景创建人 / 修改人字段')
+def _scene_audit_columns(conn):
+    for name in ('creator_department', 'creator_name', 'updater_department', 'updater_name'):
+        add_column(conn, 'business_scene', sa.Column(name, sa.String(50)))
+
+
+@migration(2, '步骤配图字段')
+def _step_image_column(conn):
+    add_column(conn, 'scene_step', sa.Column('image_url', sa.String(255)))
+
+
+@migration(3, '步骤注意事项预计算字段')
+def _step_notes_columns(conn):
+    add_column(conn, 'scene_step', sa.Column('notes', sa.Text))
+    add_column(conn, 'scene_step', sa.Column('notes_version', sa.Integer))
+
+
+@migration(4, '场景库变更日志表')
+def _catalog_change_table(conn):
+    change_bus.catalog_change.create(conn, checkfirst=True)
+
+
+@migration(5, '变更日志修改人与明细字段')
+def _catalog_change_audit_columns(conn):
+    add_column(conn, change_bus.CHANGE_TABLE, sa.Column('changed_by', sa.String(100)))
+    add_column(conn, change_bus.CHANGE_TABLE, sa.Column('detail', sa.Text))
+
+
+def current_version(conn):
+    if not sa.inspect(conn).has_table(SCHEMA_TABLE):
+        return 0
+    return conn.execute(sa.select(sa.func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade(engine):
+    """执行尚未执行的迁移，返回本次执行的 [Migration]"""
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(sa.text('SELECT pg_advisory_xact_lock(:key)'), {'key': _LOCK_KEY})
+        _metadata.create_all(conn, checkfirst=True)
+        version = current_version(conn)
+        for m in MIGRATIONS:
+            if m.version <= version:
+                continue
+            m.upgrade(conn)
+            conn.execute(schema_version.insert().values(version=m.version, description=m.description,
+                                                         applied_at=datetime.utcnow()))
+            applied.append(m)
+    return applied
@@ -0,0 +1,96 @@
+"""OCR 结果缓存（按文件内容哈希）
+
+管理员因重名、改分类等原因反复上传同一份 PDF / 截图时，直接复用上次的识别结果。
+缓存键 = SHA-256(文件内容摘要 + 页码 + OCR 参数)，文本存放在 instance/ocr_cache 下，
+总大小超过上限时按最近访问时间淘汰。
+"""
+import hashlib
+import os
+import threading
+
+CACHE_VERSION = 1
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class OcrCache:
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(digest, page=None, **params):
+        """digest 为文件内容摘要；page 为 PDF 页索引（图片为 None）；params 为 dpi / lang 等识别参数"""
+        parts = [str(CACHE_VERSION), digest, '' if page is None else str(page)]
+        parts.extend(f'{k}={params[k]}' for k in sorted(params))
+        return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.txt')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        data = text.encode('utf-8')
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._approx_bytes += len(data)
+            if self._approx_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def _evict(self):
+        """淘汰最久未访问的条目，降到上限的 90%"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._approx_bytes = total
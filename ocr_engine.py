@@ -0,0 +1,156 @@
+"""PDF 分页并行 OCR 引擎
+
+页面渲染（pdfplumber）与 tesseract 识别都是 CPU 密集操作，这里把每一页作为一个任务
+分发到进程池中：子进程自行打开 PDF 渲染指定页并识别，父进程只收发页码与文本，
+渲染出的大图不跨进程传递。同时在途的页数有上限，内存占用与 PDF 总页数无关；
+结果按页码顺序逐页产出，调用方可以边识别边处理。
+传入 OcrCache 时，已识别过的页（同一文件内容 + 同样参数）直接取缓存，不再提交子进程。
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from ocr_cache import file_digest
+
+DEFAULT_DPI = 300
+DEFAULT_LANG = 'chi_sim+eng'
+
+OcrPage = namedtuple('OcrPage', 'index text seconds cached')
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# 子进程内缓存最近打开的 PDF，同一文件的连续页无需重复解析
+_open_pdf = None
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def _init_worker():
+    # 每个进程只跑一个 tesseract，避免其内部 OpenMP 线程与进程池争抢 CPU
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                                        initializer=_init_worker)
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _get_pdf(pdf_path):
+    global _open_pdf
+    import pdfplumber
+    if _open_pdf is not None and _open_pdf[0] == pdf_path:
+        return _open_pdf[1]
+    if _open_pdf is not None:
+        _open_pdf[1].close()
+    pdf = pdfplumber.open(pdf_path)
+    _open_pdf = (pdf_path, pdf)
+    return pdf
+
+
+def ocr_page(pdf_path, page_index, dpi=DEFAULT_DPI, lang=DEFAULT_LANG):
+    """渲染并识别单页（在子进程中执行），返回 (文本, 耗时秒数)"""
+    import pytesseract
+    started = time.perf_counter()
+    page = _get_pdf(pdf_path).pages[page_index]
+    image = page.to_image(resolution=dpi).original
+    try:
+        return pytesseract.image_to_string(image, lang=lang), time.perf_counter() - started
+    finally:
+        image.close()
+        page.close()
+
+
+def page_count(pdf_path):
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def iter_pdf_ocr(pdf_path, pages=None, dpi=DEFAULT_DPI, lang=DEFAULT_LANG, workers=None, max_in_flight=None,
+                 cache=None):
+    """按页码顺序逐页产出 OcrPage(页索引, 文本, 单页渲染+识别耗时, 是否命中缓存)
+
+    pages 为需要识别的页索引列表（默认全部页）；max_in_flight 限制已提交但尚未被消费的页数，
+    默认为进程数的两倍；cache 为可选的 OcrCache。
+    """
+    if pages is None:
+        pages = range(page_count(pdf_path))
+    pages = list(pages)
+    if not pages:
+        return
+
+    keys = {}
+    cached = {}
+    if cache is not None:
+        digest = file_digest(pdf_path)
+        for index in pages:
+            keys[index] = cache.make_key(digest, index, dpi=dpi, lang=lang)
+            text = cache.get(keys[index])
+            if text is not None:
+                cached[index] = text
+    todo = [index for index in pages if index not in cached]
+
+    workers = workers or default_workers()
+    max_in_flight = max(1, max_in_flight or workers * 2)
+    pool = _get_pool(workers) if todo else None
+
+    futures = {}
+    submitted = 0
+    try:
+        for index in pages:
+            if index in cached:
+                yield OcrPage(index, cached[index], 0.0, True)
+                continue
+            while submitted < len(todo) and len(futures) < max_in_flight:
+                page_index = todo[submitted]
+                futures[page_index] = pool.submit(ocr_page, pdf_path, page_index, dpi, lang)
+                submitted += 1
+            text, seconds = futures.pop(index).result()
+            if cache is not None:
+                cache.put(keys[index], text)
+            yield OcrPage(index, text, seconds, False)
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+
+def ocr_image(image_path, lang=DEFAULT_LANG, cache=None):
+    """识别单张图片，返回 (文本, 是否命中缓存)"""
+    key = None
+    if cache is not None:
+        key = cache.make_key(file_digest(image_path), lang=lang)
+        text = cache.get(key)
+        if text is not None:
+            return text, True
+    import pytesseract
+    from PIL import Image
+    with Image.open(image_path) as image:
+        text = pytesseract.image_to_string(image, lang=lang)
+    if cache is not None:
+        cache.put(key, text)
+    return text, False
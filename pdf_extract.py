@@ -0,0 +1,89 @@
+"""PDF 分页混合提取：有文字层的页直接取文本，扫描页才走 OCR
+
+每页先看字符数与图片覆盖率（只解析对象，不做版面分析），据此决定提取方式：
+- 既无文字也无图片（空白页）→ 跳过；
+- 字符很少（扫描件、截图页）→ OCR；
+- 大图占满页面且文字稀疏（核心系统截图配少量说明）→ OCR；
+- 其余 → pdfplumber 文本层。
+OCR 页交给 ocr_engine 并行识别，结果按页码拼回原顺序，并返回每页的方式与耗时。
+"""
+import time
+
+import pdfplumber
+
+import ocr_engine
+
+# 少于该字符数视为无可用文字层
+MIN_TEXT_CHARS = 20
+# 图片覆盖页面比例超过该值、且文字密度低于阈值时，视为截图页
+IMAGE_COVERAGE_THRESHOLD = 0.5
+# 每平方英寸字符数（正常排版正文约 30~60）
+MIN_CHAR_DENSITY = 2.0
+
+
+def _image_coverage(page):
+    page_area = float(page.width * page.height) or 1.0
+    covered = 0.0
+    for img in page.images:
+        w = max(0.0, min(img['x1'], page.width) - max(img['x0'], 0))
+        h = max(0.0, min(img['bottom'], page.height) - max(img['top'], 0))
+        covered += w * h
+    return min(1.0, covered / page_area)
+
+
+def needs_ocr(page):
+    """判断单页是否需要 OCR，返回 (是否OCR, 原因)"""
+    chars = len(page.chars)
+    if chars == 0 and not page.images:
+        return False, 'blank'
+    if chars < MIN_TEXT_CHARS:
+        return True, 'no_text_layer'
+    area_sq_inch = float(page.width * page.height) / (72 * 72) or 1.0
+    if _image_coverage(page) >= IMAGE_COVERAGE_THRESHOLD and chars / area_sq_inch < MIN_CHAR_DENSITY:
+        return True, 'image_page'
+    return False, 'text_layer'
+
+
+def extract_pdf(pdf_path, dpi=ocr_engine.DEFAULT_DPI, lang=ocr_engine.DEFAULT_LANG, workers=None,
+                max_in_flight=None, progress=None, cache=None):
+    """提取整份 PDF 的文本，返回 (content, pages)
+
+    pages 为每页报告列表：{'page', 'method', 'reason', 'chars', 'seconds'}，OCR 页另有 'cached'；
+    progress(已完成页数, 总页数) 用于上报进度；cache 为可选的 OcrCache。
+    """
+    reports = []
+    texts = {}
+    ocr_pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        total = len(pdf.pages)
+        for index, page in enumerate(pdf.pages):
+            started = time.perf_counter()
+            use_ocr, reason = needs_ocr(page)
+            if use_ocr:
+                ocr_pages.append(index)
+            else:
+                texts[index] = page.extract_text() or ''
+            reports.append({
+                'page': index + 1,
+                'method': 'ocr' if use_ocr else 'text',
+                'reason': reason,
+                'chars': 0 if use_ocr else len(texts[index]),
+                'seconds': round(time.perf_counter() - started, 3),
+            })
+            page.close()
+            if progress and not use_ocr:
+                progress(len(texts), total)
+
+    if ocr_pages:
+        for page in ocr_engine.iter_pdf_ocr(pdf_path, pages=ocr_pages, dpi=dpi, lang=lang, workers=workers,
+                                            max_in_flight=max_in_flight, cache=cache):
+            texts[page.index] = page.text
+            report = reports[page.index]
+            report['chars'] = len(page.text)
+            report['seconds'] = round(report['seconds'] + page.seconds, 3)
+            report['cached'] = page.cached
+            if progress:
+                progress(len(texts), total)
+
+    content = '\n'.join(texts[i] for i in range(len(reports)))
+    return content, reports
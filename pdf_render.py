@@ -0,0 +1,276 @@
+"""场景 PDF 渲染（单场景导出与合集导出共用）
+
+- 进程内只注册一次中文字体：优先使用配置的 TTF/TTC 路径，其次尝试常见系统字体，
+  都没有时退回 reportlab 内置的 STSong-Light（CID 字体，由阅读器提供字形，不嵌入文件）；
+- 样式表只构建一次；
+- reportlab 导入较慢，本模块只在首次导出 PDF 时由 app 按需导入；
+- 步骤配图以 ImageReader 缓存（按路径 + 修改时间），按原图比例缩放到版心宽度内，
+  不再固定拉伸为 5x3 英寸。
+"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Flowable, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+from reportlab.platypus.tableofcontents import TableOfContents
+
+import image_pipeline
+from step_notes import RISK_NOTES
+
+logger = logging.getLogger(__name__)
+
+FONT_NAME = 'SceneCJK'
+FALLBACK_CID_FONT = 'STSong-Light'
+# 常见的 TrueType 轮廓中文字体（reportlab 不支持 CFF 轮廓的 OTF，如 Noto Sans CJK）
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/wqy-microhei/wqy-microhei.ttc',
+    '/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc',
+    '/usr/share/fonts/truetype/arphic/uming.ttc',
+    'C:/Windows/Fonts/msyh.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+    'C:/Windows/Fonts/simsun.ttc',
+    '/System/Library/Fonts/STHeiti Light.ttc',
+    '/Library/Fonts/Arial Unicode.ttf',
+)
+
+PAGE_MARGIN = 2 * cm
+# 步骤配图最大高度；像素按 96dpi 换算为磅，小图不放大
+IMAGE_MAX_HEIGHT = 12 * cm
+PIXEL_TO_POINT = 72.0 / 96.0
+
+_font_lock = threading.Lock()
+_font_name = None
+
+
+def register_cjk_font(font_path=None):
+    """注册中文字体（每个进程只执行一次），返回可用于样式的字体名"""
+    global _font_name
+    with _font_lock:
+        if _font_name:
+            return _font_name
+        for path in ([font_path] if font_path else []) + list(FONT_CANDIDATES):
+            if not os.path.isfile(path):
+                if path == font_path:
+                    logger.warning(f'PDF 字体文件不存在: {path}')
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, path, subfontIndex=0))
+            except Exception as e:
+                logger.warning(f'PDF 字体注册失败 {path}: {e}')
+                continue
+            pdfmetrics.registerFontFamily(FONT_NAME, normal=FONT_NAME, bold=FONT_NAME,
+                                          italic=FONT_NAME, boldItalic=FONT_NAME)
+            logger.info(f'PDF 使用字体: {path}')
+            _font_name = FONT_NAME
+            return _font_name
+        pdfmetrics.registerFont(UnicodeCIDFont(FALLBACK_CID_FONT))
+        logger.info(f'未找到中文 TTF 字体，PDF 使用内置 {FALLBACK_CID_FONT}')
+        _font_name = FALLBACK_CID_FONT
+        return _font_name
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """PDF 样式表（进程内只构建一次）"""
+    font = register_cjk_font()
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(name='CustomHeading1', fontName=font, fontSize=18, leading=24,
+                              textColor=colors.HexColor('#0b3d91'), spaceAfter=18, alignment=TA_CENTER))
+    styles.add(ParagraphStyle(name='CustomHeading2', fontName=font, fontSize=16, leading=22,
+                              textColor=colors.HexColor('#1456b8'), spaceAfter=12))
+    styles.add(ParagraphStyle(name='CustomHeading3', fontName=font, fontSize=14, leading=20,
+                              textColor=colors.HexColor('#2f80ed'), spaceAfter=8))
+    styles.add(ParagraphStyle(name='NormalText', fontName=font, fontSize=12, leading=18,
+                              spaceAfter=6, alignment=TA_LEFT, wordWrap='CJK'))
+    styles.add(ParagraphStyle(name='NoteText', fontName=font, fontSize=12, leading=18,
+                              textColor=colors.HexColor('#e74c3c'), spaceAfter=6, alignment=TA_LEFT,
+                              wordWrap='CJK'))
+    styles.add(ParagraphStyle(name='TOCEntry', fontName=font, fontSize=12, leading=18, leftIndent=12,
+                              spaceAfter=4))
+    return styles
+
+
+class ImageCache:
+    """步骤配图 ImageReader 缓存，键为 (路径, 修改时间)，按字节数做 LRU 淘汰"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # ImageReader 内部共用一个文件指针，嵌入 PDF 时需串行
+        self.draw_lock = threading.Lock()
+
+    def get(self, path):
+        try:
+            key = (path, os.path.getmtime(path))
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+        with open(path, 'rb') as f:
+            data = f.read()
+        reader = ImageReader(io.BytesIO(data))
+        reader.getSize()
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (reader, len(data))
+                self._bytes += len(data)
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    _, (_, size) = self._entries.popitem(last=False)
+                    self._bytes -= size
+        return reader
+
+
+image_cache = ImageCache()
+
+
+class StepImage(Flowable):
+    """按原图比例绘制的步骤配图：不超过版心宽度与最大高度，小图不放大"""
+
+    def __init__(self, reader, max_height=IMAGE_MAX_HEIGHT):
+        super().__init__()
+        self.reader = reader
+        self.max_height = max_height
+        width, height = reader.getSize()
+        self.image_width = width * PIXEL_TO_POINT
+        self.image_height = height * PIXEL_TO_POINT
+        self.hAlign = 'CENTER'
+
+    def wrap(self, avail_width, avail_height):
+        scale = min(1.0, avail_width / self.image_width, self.max_height / self.image_height)
+        self.draw_width = self.image_width * scale
+        self.draw_height = self.image_height * scale
+        return self.draw_width, self.draw_height
+
+    def draw(self):
+        with image_cache.draw_lock:
+            self.canv.drawImage(self.reader, 0, 0, self.draw_width, self.draw_height, mask='auto')
+
+
+def _text(value):
+    """转义为 Paragraph 可用的标记文本，保留换行"""
+    return escape(value or '').replace('\n', '<br/>')
+
+
+def scene_elements(scene, upload_folder, bookmark=None):
+    """单个场景的 PDF 内容；bookmark 非空时标题登记为合集目录项"""
+    styles = get_styles()
+    elements = []
+
+    title = Paragraph(_text(scene.name), styles['CustomHeading1'])
+    title.toc_bookmark = bookmark
+    elements.append(title)
+    elements.append(Spacer(1, 12))
+
+    elements.append(Paragraph(f"描述：{_text(scene.description)}", styles['NormalText']))
+    elements.append(Spacer(1, 6))
+    elements.append(Paragraph(f"业务分类：{_text(scene.category)}", styles['NormalText']))
+    elements.append(Spacer(1, 6))
+
+    creator_info = f"创建：{scene.creator_department or '-'}{scene.creator_name or '-'} · "
+    if scene.created_at:
+        creator_info += scene.created_at.strftime('%Y-%m-%d %H:%M')
+    elements.append(Paragraph(_text(creator_info), styles['NormalText']))
+    if scene.updater_department or scene.updater_name:
+        updater_info = f"修改：{scene.updater_department or '-'}{scene.updater_name or '-'} · "
+        if scene.updated_at:
+            updater_info += scene.updated_at.strftime('%Y-%m-%d %H:%M')
+        elements.append(Paragraph(_text(updater_info), styles['NormalText']))
+    elements.append(Spacer(1, 24))
+
+    elements.append(Paragraph("操作步骤", styles['CustomHeading2']))
+    elements.append(Spacer(1, 12))
+    for step in sorted(scene.steps, key=lambda x: x.step_number):
+        elements.append(Paragraph(f"{step.step_number}. {_text(step.description)}", styles['CustomHeading3']))
+        if step.transaction_code:
+            elements.append(Paragraph(f"交易代码：{_text(step.transaction_code)}", styles['NormalText']))
+        if step.details:
+            elements.append(Spacer(1, 6))
+            elements.append(Paragraph("操作说明：", styles['NormalText']))
+            elements.append(Paragraph(_text(step.details), styles['NormalText']))
+        if step.condition:
+            elements.append(Spacer(1, 6))
+            elements.append(Paragraph("执行条件：", styles['NormalText']))
+            elements.append(Paragraph(_text(step.condition), styles['NormalText']))
+
+        elements.append(Spacer(1, 6))
+        elements.append(Paragraph("注意事项：", styles['NormalText']))
+        for note in step.note_list:
+            elements.append(Paragraph(f"• {_text(note)}", styles['NoteText']))
+
+        # 取适合打印宽度的派生图，避免嵌入多 MB 原图
+        img_path = image_pipeline.best_rendition_path(upload_folder, step.image_url, 1280)
+        if img_path:
+            try:
+                elements.append(Spacer(1, 12))
+                elements.append(StepImage(image_cache.get(img_path)))
+            except Exception as e:
+                logger.error(f"添加图片失败: {e}")
+        elements.append(Spacer(1, 24))
+
+    elements.append(Paragraph("风险提示", styles['CustomHeading2']))
+    elements.append(Spacer(1, 12))
+    for note in RISK_NOTES:
+        elements.append(Paragraph(f"• {note}", styles['NoteText']))
+    return elements
+
+
+def _document(output, doc_class=SimpleDocTemplate):
+    return doc_class(output, pagesize=A4, rightMargin=PAGE_MARGIN, leftMargin=PAGE_MARGIN,
+                     topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN)
+
+
+def render_scene(scene, upload_folder):
+    """渲染单个场景，返回 PDF 字节"""
+    buffer = io.BytesIO()
+    _document(buffer).build(scene_elements(scene, upload_folder))
+    return buffer.getvalue()
+
+
+class BinderDocTemplate(SimpleDocTemplate):
+    """合集 PDF：场景标题排版后登记目录项与书签"""
+
+    def afterFlowable(self, flowable):
+        key = getattr(flowable, 'toc_bookmark', None)
+        if key:
+            text = flowable.getPlainText()
+            self.canv.bookmarkPage(key)
+            self.canv.addOutlineEntry(text, key, level=0)
+            self.notify('TOCEntry', (0, text, self.page, key))
+
+
+def render_binder(scenes, title, output, upload_folder):
+    """多个场景合成一份带目录的 PDF，写入 output（文件对象）
+
+    scenes 可以是按批加载的迭代器：每个场景转换成排版元素后即不再引用 ORM 对象。
+    目录页码需要 multiBuild 多遍排版，排版元素本身仍须全部保留在内存中（由 BINDER_MAX_SCENES 限制规模）。
+    """
+    styles = get_styles()
+    toc = TableOfContents()
+    toc.levelStyles = [styles['TOCEntry']]
+    story = [Paragraph(_text(title), styles['CustomHeading1']), Spacer(1, 12),
+             Paragraph("目录", styles['CustomHeading2']), toc]
+    for scene in scenes:
+        story.append(PageBreak())
+        story.extend(scene_elements(scene, upload_folder, bookmark=f'scene-{scene.id}'))
+    # 目录页码需要两遍排版
+    _document(output, BinderDocTemplate).multiBuild(story)
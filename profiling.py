@@ -0,0 +1,317 @@
+"""按需性能剖析：管理员为某个路由（或后台任务）开启剖析，只采集接下来的 N 次执行
+
+- cprofile：确定性剖析（cProfile），结果为 .pstats，可用 snakeviz、gprof2dot、flameprof 等查看；
+- sample：统计采样，后台线程按固定间隔抓取目标线程的调用栈，结果为折叠栈 .collapsed
+  （每行 "栈帧;栈帧;... 次数"），可直接交给 flamegraph.pl 或 speedscope 生成火焰图。
+  采样开销与被测代码无关，适合 reportlab / python-docx 这类调用层级很深的渲染。
+
+开启记录保存在 instance/profiles/armed.json，各 worker 每隔几秒检查一次该文件的修改时间，
+因此在任意 worker 上开启都对全部 worker 生效；名额在文件锁内扣减，多个 worker 合计只采集 N 次。
+未开启时每个请求只多一次时间比较，不做任何文件操作。
+结果保存在 instance/profiles/<会话编号>/ 下，超出保留数量时删除最早的会话。
+"""
+import cProfile
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from flask import g, request
+from werkzeug.security import safe_join
+
+try:
+    import fcntl
+except ImportError:  # Windows 开发环境：只在进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ARMED_FILE = 'armed.json'
+MODES = ('cprofile', 'sample')
+DEFAULT_SAMPLE_INTERVAL = 0.005
+MAX_STACK_DEPTH = 200
+
+
+def _active(sessions):
+    now = time.time()
+    return [s for s in sessions if s['remaining'] > 0 and s['expires_at'] > now]
+
+
+class Sampler:
+    """统计采样：在后台线程中按 interval 抓取 thread_id 的调用栈，按折叠栈计数"""
+
+    def __init__(self, thread_id, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    def __init__(self, directory, max_sessions=20, poll_interval=2.0):
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.poll_interval = poll_interval
+        self._armed_path = os.path.join(directory, ARMED_FILE)
+        self._lock = threading.Lock()
+        self._targets = frozenset()
+        self._mtime = None
+        self._next_check = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['profiler'] = self
+
+    # ---- 开启 / 关闭 ----
+
+    def arm(self, target, count, mode='cprofile', interval=DEFAULT_SAMPLE_INTERVAL, ttl=1800):
+        """为 target（路由 endpoint 或 job:<任务类型>）开启剖析，返回会话记录"""
+        if mode not in MODES:
+            raise ValueError(f'不支持的剖析方式: {mode}')
+        session = {
+            'id': datetime.now().strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6],
+            'target': target,
+            'mode': mode,
+            'interval': interval,
+            'requested': count,
+            'remaining': count,
+            'created_at': time.time(),
+            'expires_at': time.time() + ttl,
+        }
+        with self._armed_file() as sessions:
+            sessions[:] = [s for s in sessions if s['target'] != target]
+            sessions.append(session)
+        self._prune()
+        return session
+
+    def disarm(self, target=None):
+        with self._armed_file() as sessions:
+            sessions[:] = [s for s in sessions if target is not None and s['target'] != target]
+
+    def armed(self):
+        with self._armed_file() as sessions:
+            return list(sessions)
+
+    @contextmanager
+    def _armed_file(self):
+        """在文件锁内读写开启记录（yield 出可修改的列表，退出时写回并清理过期 / 用尽的会话）"""
+        with self._lock, open(self._lock_path(), 'a+') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self._armed_path, encoding='utf-8') as f:
+                        sessions = json.load(f)
+                except (OSError, ValueError):
+                    sessions = []
+                original = json.dumps(sessions)
+                sessions = _active(sessions)
+                yield sessions
+                sessions[:] = _active(sessions)
+                if json.dumps(sessions) != original:
+                    tmp_path = f'{self._armed_path}.{os.getpid()}.tmp'
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(sessions, f)
+                    os.replace(tmp_path, self._armed_path)
+                self._targets = frozenset(s['target'] for s in sessions)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lock_path(self):
+        return os.path.join(self.directory, '.lock')
+
+    def _refresh(self):
+        """按修改时间检查开启记录是否变化（每 poll_interval 秒最多一次）"""
+        self._next_check = time.monotonic() + self.poll_interval
+        try:
+            mtime = os.stat(self._armed_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self.armed()
+
+    def _claim(self, target):
+        """扣减一个名额，成功时返回 (会话, 序号)"""
+        if time.monotonic() >= self._next_check:
+            self._refresh()
+        if target not in self._targets:
+            return None
+        with self._armed_file() as sessions:
+            for s in sessions:
+                if s['target'] == target and s['remaining'] > 0:
+                    s['remaining'] -= 1
+                    return dict(s), s['requested'] - s['remaining']
+        return None
+
+    # ---- 采集 ----
+
+    @contextmanager
+    def profile(self, target, label=None):
+        """若 target 已开启剖析则采集本次执行，否则直接执行"""
+        claimed = self._claim(target)
+        if claimed is None:
+            yield
+            return
+        session, seq = claimed
+        recorder = self._start(session)
+        if recorder is None:
+            yield
+            return
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            self._finish(session, seq, recorder, time.perf_counter() - started, label, error)
+
+    def wrap(self, target, func):
+        """包装后台任务处理函数，使 target（如 job:import_file）开启时同样可被剖析"""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.profile(target):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def _start(self, session):
+        if session['mode'] == 'sample':
+            recorder = Sampler(threading.get_ident(), session['interval'])
+            recorder.start()
+            return recorder
+        recorder = cProfile.Profile()
+        try:
+            recorder.enable()
+        except ValueError:
+            # 同一进程内已有其他剖析在运行（Python 3.12 起 cProfile 全进程只能启用一个），本次放弃
+            logger.warning(f"已有剖析在运行，跳过本次 {session['target']} 剖析")
+            return None
+        return recorder
+
+    def _finish(self, session, seq, recorder, seconds, label, error, status=None):
+        session_dir = os.path.join(self.directory, session['id'])
+        os.makedirs(session_dir, exist_ok=True)
+        stem = f"{seq:03d}-{os.getpid()}"
+        if isinstance(recorder, Sampler):
+            recorder.stop()
+            filename = f'{stem}.collapsed'
+            recorder.write(os.path.join(session_dir, filename))
+        else:
+            recorder.disable()
+            filename = f'{stem}.pstats'
+            recorder.dump_stats(os.path.join(session_dir, filename))
+        meta = {'session': session['id'], 'target': session['target'], 'mode': session['mode'],
+                'file': filename, 'seconds': round(seconds, 4), 'label': label, 'error': error,
+                'status': status, 'pid': os.getpid(), 'finished_at': time.time()}
+        with open(os.path.join(session_dir, f'{stem}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        logger.info(f"已采集剖析 {session['target']} #{seq}（{session['mode']}，{seconds:.3f}s）: {filename}")
+
+    def _before_request(self):
+        if time.monotonic() < self._next_check and not self._targets:
+            return
+        claimed = self._claim(request.endpoint)
+        if claimed is None:
+            return
+        session, seq = claimed
+        recorder = self._start(session)
+        if recorder is not None:
+            g.profiling = (session, seq, recorder, time.perf_counter())
+
+    def _after_request(self, response):
+        if 'profiling' in g:
+            g.profiling_status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        state = g.pop('profiling', None)
+        if state is None:
+            return
+        session, seq, recorder, started = state
+        self._finish(session, seq, recorder, time.perf_counter() - started, request.full_path.rstrip('?'),
+                     repr(exc) if exc else None, g.pop('profiling_status', None))
+
+    # ---- 结果 ----
+
+    def list_profiles(self):
+        profiles = []
+        for session_id in sorted(self._session_dirs(), reverse=True):
+            session_dir = os.path.join(self.directory, session_id)
+            for name in sorted(os.listdir(session_dir)):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(session_dir, name), encoding='utf-8') as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                meta['path'] = f"{session_id}/{meta['file']}"
+                profiles.append(meta)
+        return profiles
+
+    def resolve(self, path):
+        """把 '<会话>/<文件>' 解析为绝对路径（只允许结果文件），不存在时返回 None"""
+        if not path.endswith(('.pstats', '.collapsed')):
+            return None
+        full = safe_join(self.directory, path)
+        return full if full and os.path.isfile(full) else None
+
+    def summary(self, path, limit=40, sort='cumulative'):
+        """pstats 文件的文本摘要（按累计耗时排序的前 limit 个函数）"""
+        import io
+        import pstats
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def _session_dirs(self):
+        try:
+            return [n for n in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, n))]
+        except OSError:
+            return []
+
+    def _prune(self):
+        for session_id in sorted(self._session_dirs())[:-self.max_sessions]:
+            shutil.rmtree(os.path.join(self.directory, session_id), ignore_errors=True)
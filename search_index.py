@@ -0,0 +1,212 @@
+"""场景全文检索索引（SQLite FTS5）
+
+中文没有空格分词，FTS5 自带的 unicode61 分词器会把整段汉字当成一个词。
+这里在写入前自行切词：汉字按「单字 + 相邻双字」展开，其余按字母数字串切分，
+再以空格拼接写入 FTS5 表，查询时对关键词做同样的切分，从而无需额外的中文分词扩展。
+索引行分两类：场景行（名称 / 描述 + 分类）与步骤行（步骤描述 / 交易码 + 说明 + 条件）。
+"""
+import re
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+SEARCH_TABLE = 'scene_search'
+
+# 标题列权重远高于正文，场景名称/步骤描述命中优先
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+_CJK_CHARS = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_CJK_RE = re.compile(f'[{_CJK_CHARS}]+')
+_WORD_RE = re.compile(f'[{_CJK_CHARS}]+|[0-9a-zA-Z_]+')
+
+SearchHit = namedtuple('SearchHit', 'scene_id score step_id')
+
+_enabled = False
+
+
+def tokenize(value):
+    """把文本切成检索词：汉字串展开为单字与双字，字母数字串整体小写"""
+    tokens = []
+    for word in _WORD_RE.findall(value or ''):
+        if _CJK_RE.fullmatch(word):
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def query_terms(q):
+    """关键词切分：汉字串只取双字（单字串取单字），避免单字拉低排序区分度"""
+    terms = []
+    for word in _WORD_RE.findall(q or ''):
+        if not _CJK_RE.fullmatch(word):
+            terms.append(word.lower())
+        elif len(word) == 1:
+            terms.append(word)
+        else:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    # 去重但保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def _match_expression(terms):
+    return ' '.join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+def _joined(*parts):
+    return ' '.join(tokenize(' '.join(p for p in parts if p)))
+
+
+def is_enabled():
+    return _enabled
+
+
+def can_search(q):
+    """能否用全文索引检索 q：索引未启用或 q 中没有可检索的词（如只有标点）时应回退到 LIKE 查询"""
+    return _enabled and bool(query_terms(q))
+
+
+def _table_exists(conn):
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {'n': SEARCH_TABLE}
+    ).first() is not None
+
+
+def init_search_index(engine):
+    """建立 FTS5 索引表；返回 True 表示表是新建的（需要全量重建）
+
+    非 SQLite 或 SQLite 未编译 FTS5 时禁用索引，检索回退到 LIKE 查询。
+    多个进程同时启动时可能同时建表：建表使用 IF NOT EXISTS，其他错误时再确认一次表是否已由别的进程建好，
+    只有确实缺少 fts5 模块时才禁用索引。
+    """
+    global _enabled
+    _enabled = False
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect() as conn:
+        exists = _table_exists(conn)
+    if not exists:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                    "scene_id UNINDEXED, step_id UNINDEXED, title, body, "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                ))
+        except OperationalError as e:
+            if 'no such module' in str(e):
+                return False
+            with engine.connect() as conn:
+                if not _table_exists(conn):
+                    raise
+    _enabled = True
+    return not exists
+
+
+def remove_scene(session, scene_id):
+    """删除场景的全部索引行（在调用方事务内执行）"""
+    if not _enabled:
+        return
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE scene_id = :sid"), {'sid': scene_id})
+
+
+def index_scene(session, scene_id):
+    """重建单个场景的索引行；调用方负责提交事务"""
+    if not _enabled:
+        return
+    session.flush()
+    remove_scene(session, scene_id)
+    scene = session.execute(
+        text("SELECT name, description, category FROM business_scene WHERE id = :sid"), {'sid': scene_id}
+    ).first()
+    if scene is None:
+        return
+    rows = [{'sid': scene_id, 'stid': None,
+             'title': _joined(scene.name), 'body': _joined(scene.description, scene.category)}]
+    steps = session.execute(
+        text("SELECT id, description, transaction_code, details, condition FROM scene_step WHERE scene_id = :sid"),
+        {'sid': scene_id}
+    ).fetchall()
+    for step in steps:
+        rows.append({'sid': scene_id, 'stid': step.id,
+                     'title': _joined(step.description),
+                     'body': _joined(step.transaction_code, step.details, step.condition)})
+    session.execute(
+        text(f"INSERT INTO {SEARCH_TABLE} (scene_id, step_id, title, body) VALUES (:sid, :stid, :title, :body)"),
+        rows
+    )
+
+
+def rebuild_search_index(session, batch_size=500):
+    """全量重建索引（用于已有数据库首次启用或索引损坏），返回场景数"""
+    if not _enabled:
+        return 0
+    session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    count = 0
+    last_id = 0
+    while True:
+        ids = [r[0] for r in session.execute(
+            text("SELECT id FROM business_scene WHERE id > :last ORDER BY id LIMIT :n"),
+            {'last': last_id, 'n': batch_size}
+        )]
+        if not ids:
+            break
+        for scene_id in ids:
+            index_scene(session, scene_id)
+        count += len(ids)
+        last_id = ids[-1]
+        session.commit()
+    session.commit()
+    return count
+
+
+def search_scenes(session, q, category=None, limit=100):
+    """按相关度返回命中的场景列表 [SearchHit]，同一场景取最佳命中行（先用 can_search 判断能否检索）"""
+    terms = query_terms(q)
+    if not _enabled or not terms:
+        return []
+    sql = (f"SELECT s.scene_id, s.step_id, bm25({SEARCH_TABLE}, 0.0, 0.0, :tw, :bw) AS score "
+           f"FROM {SEARCH_TABLE} s")
+    params = {'match': _match_expression(terms), 'tw': TITLE_WEIGHT, 'bw': BODY_WEIGHT, 'n': limit * 5}
+    if category:
+        sql += " JOIN business_scene b ON b.id = s.scene_id"
+    sql += f" WHERE {SEARCH_TABLE} MATCH :match"
+    if category:
+        sql += " AND b.category = :category"
+        params['category'] = category
+    rows = session.execute(text(sql + " ORDER BY score LIMIT :n"), params).fetchall()
+    hits = {}
+    for row in rows:
+        if row.scene_id not in hits:
+            hits[row.scene_id] = SearchHit(row.scene_id, row.score, row.step_id)
+    return list(hits.values())[:limit]
+
+
+def highlight(value, q, width=60):
+    """截取关键词附近的片段并用 <mark> 标出命中词，返回可直接输出的 Markup"""
+    value = value or ''
+    words = sorted({w for w in _WORD_RE.findall(q or '')}, key=len, reverse=True)
+    if not value or not words:
+        return Markup('')
+    pattern = re.compile('|'.join(re.escape(w) for w in words), re.IGNORECASE)
+    first = pattern.search(value)
+    if first is None:
+        # 整词未命中（双字匹配跨越了词边界），退回按单字高亮
+        pattern = re.compile('|'.join(re.escape(c) for w in words for c in w), re.IGNORECASE)
+        first = pattern.search(value)
+    start = max(0, (first.start() if first else 0) - width // 3)
+    piece = value[start:start + width]
+    parts = []
+    pos = 0
+    for m in pattern.finditer(piece):
+        parts.append(escape(piece[pos:m.start()]))
+        parts.append(Markup('<mark>{}</mark>').format(m.group(0)))
+        pos = m.end()
+    parts.append(escape(piece[pos:]))
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(value) else ''
+    return Markup(prefix) + Markup('').join(parts) + Markup(suffix)
@@ -85,7 +85,7 @@ if [ -d "$PROJECT_DIR" ]; then
     
     # 启动Gunicorn服务
     echo "正在启动Gunicorn服务..."
-    gunicorn --bind 0.0.0.0:5000 wsgi:app --daemon --workers 3 --timeout 300
+    gunicorn -c gunicorn.conf.py --bind 0.0.0.0:5000 wsgi:app --daemon --workers 3 --timeout 300
     
     # 检查启动状态
     sleep 3
@@ -94,7 +94,7 @@ if [ -d "$PROJECT_DIR" ]; then
     else
       echo "✗ Gunicorn服务启动失败，请检查错误日志"
       echo "尝试直接运行查看错误:"
-      echo "cd $PROJECT_DIR && source venv/bin/activate && gunicorn --bind 0.0.0.0:5000 wsgi:app"
+      echo "cd $PROJECT_DIR && source venv/bin/activate && gunicorn -c gunicorn.conf.py --bind 0.0.0.0:5000 wsgi:app"
     fi
   fi
 else
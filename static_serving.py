@@ -0,0 +1,92 @@
+"""静态文件与上传文件的生产环境发送
+
+- 上传图片按内容哈希 / uuid 命名，内容永不变化，响应带一年期 immutable 缓存头；
+- CSS / JS 等文本资源若存在预压缩的 .br / .gz 文件，按 Accept-Encoding 直接发送压缩版本；
+- 可选交给 nginx 发送文件体：X-Accel-Redirect（nginx internal location）或 X-Sendfile（Apache / lighttpd），
+  Python 只负责鉴权与响应头。
+"""
+import gzip
+import mimetypes
+import os
+
+from flask import abort, send_from_directory
+from werkzeug.security import safe_join
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.html', '.txt', '.map')
+
+# 预压缩文件扩展名，按优先顺序
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只生成 .gz
+    brotli = None
+
+
+def _offload(response_class, path, internal_url, mode):
+    response = response_class(status=200)
+    mimetype, _ = mimetypes.guess_type(path)
+    response.mimetype = mimetype or 'application/octet-stream'
+    if mode == 'x-accel-redirect':
+        response.headers['X-Accel-Redirect'] = internal_url
+    else:
+        response.headers['X-Sendfile'] = path
+    return response
+
+
+def send_upload(app, directory, filename):
+    """发送上传文件：内容不可变，允许浏览器 / CDN 长期缓存"""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    mode = app.config.get('STATIC_OFFLOAD')
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        prefix = app.config['STATIC_OFFLOAD_PREFIX'].rstrip('/')
+        response = _offload(app.response_class, path, f'{prefix}/{filename}', mode)
+    else:
+        response = send_from_directory(directory, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+
+def send_static(app, request, filename):
+    """发送 static 目录下的文件，优先使用预压缩版本"""
+    if filename.endswith(COMPRESSIBLE_EXTENSIONS):
+        accepted = request.accept_encodings
+        for encoding, suffix in _ENCODINGS:
+            if not accepted[encoding]:
+                continue
+            compressed = safe_join(app.static_folder, filename + suffix)
+            if compressed and os.path.isfile(compressed):
+                mimetype, _ = mimetypes.guess_type(filename)
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                               max_age=app.get_send_file_max_age(filename))
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        response = app.send_static_file(filename)
+        response.vary.add('Accept-Encoding')
+        return response
+    return app.send_static_file(filename)
+
+
+def precompress(static_folder, exclude=('uploads',)):
+    """为 static 下的文本资源生成 .gz（及安装了 brotli 时的 .br）文件，返回生成的文件数"""
+    count = 0
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), static_folder) not in exclude]
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            count += 1
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+                count += 1
+    return count
@@ -0,0 +1,163 @@
+"""步骤注意事项生成
+
+根据步骤描述中的关键词给出柜员操作提示（原先在 scene_detail.html 里由前端逐步生成，
+移到服务端后详情页、批量接口与三种导出共用同一份规则）。
+
+全部规则的关键词编译成一个 Aho-Corasick 自动机，对描述只扫描一遍即可得到命中的规则，
+规则增多时耗时不随关键词数量线性增长。注意事项在步骤写入时计算并存入 scene_step.notes，
+读取时不再匹配；规则有调整时递增 NOTES_VERSION，启动时会为旧版本的步骤重新计算。
+NOTES_FINGERPRINT 由 NOTES_VERSION 与通用风险提示 RISK_NOTES 的内容计算，导出缓存键（即导出文件的 ETag）
+包含该指纹，规则升级或风险提示修改后导出文件自动换用新键，不必另行递增 EXPORT_RENDER_VERSION。
+"""
+import hashlib
+import json
+from collections import deque
+
+NOTES_VERSION = 1
+
+# (关键词, 注意事项)：描述包含任一关键词即追加对应注意事项，按规则顺序输出
+NOTE_RULES = (
+    (('银行卡',), (
+        '确认银行卡无损坏、磁条/芯片可读',
+        '检查银行卡是否在有效期内',
+        '如为芯片卡，优先使用芯片读取',
+    )),
+    (('身份核实', '三必问'), (
+        '三必问必须完整执行，不可遗漏',
+        '注意观察客户反应，如有异常及时上报',
+        '对于可疑交易，可要求提供辅助证件',
+    )),
+    (('1159', '卡状态'), (
+        '仔细检查1159返回的各项状态',
+        '特别注意"只收不付"和"不收不付"状态',
+        '确认可用余额足够，非活期余额不能用于取款',
+        '如反洗钱等级为次高风险及以上，需特别关注',
+    )),
+    (('2520', '取款'), (
+        '确认取款金额与客户需求一致',
+        '输入金额后需与客户再次确认',
+        '注意检查系统返回的交易结果',
+    )),
+    (('签名',), (
+        '确保客户在指定区域签名',
+        '检查签名是否清晰可辨',
+        '如为电子签名，确认设备正常工作',
+    )),
+    (('提交', '交易'), (
+        '提交前再次确认交易信息',
+        '等待系统返回成功响应',
+        '如遇系统繁忙，勿重复提交',
+    )),
+    (('现金', '清分'), (
+        '现金必须经过点钞机清分',
+        '注意识别假币，特别是高仿假币',
+        '新旧版人民币均需仔细检查',
+    )),
+    (('交付', '确认金额'), (
+        '交付现金时必须唱票',
+        '提醒客户当面点清金额',
+        '提示客户注意资金安全',
+        '建议客户及时核对账户余额',
+    )),
+)
+
+DEFAULT_NOTES = (
+    '严格按照操作规范执行',
+    '注意风险防控',
+    '如遇异常情况及时上报主管',
+)
+
+# 场景级风险提示，附在三种导出文件末尾
+RISK_NOTES = (
+    "请严格按照操作步骤执行，确保业务规范",
+    "注意客户身份核实，防范冒用风险",
+    "仔细检查交易代码和系统返回信息",
+    "现金业务必须经过清分和复核",
+    "如发现异常情况，立即暂停业务并报告主管",
+)
+
+NOTES_FINGERPRINT = hashlib.sha256(
+    json.dumps([NOTES_VERSION, RISK_NOTES], ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+
+class KeywordMatcher:
+    """Aho-Corasick 多模式匹配：patterns 为 {关键词: 标签}，match() 返回文本中出现的全部标签"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for keyword, label in patterns.items():
+            self._add(keyword, label)
+        self._build()
+
+    def _add(self, keyword, label):
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = nxt
+        self._output[state].add(label)
+
+    def _build(self):
+        # 根的直接子节点失败指针为根，从第二层开始按层计算
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._output[nxt] |= self._output[self._fail[nxt]]
+
+    def match(self, text):
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+
+def _compile(rules):
+    patterns = {}
+    for index, (keywords, _) in enumerate(rules):
+        for keyword in keywords:
+            # 同一关键词出现在多条规则时，以 frozenset 作标签同时命中
+            patterns.setdefault(keyword.lower(), set()).add(index)
+    return KeywordMatcher({keyword: frozenset(labels) for keyword, labels in patterns.items()})
+
+
+_matcher = _compile(NOTE_RULES)
+
+
+def compute_step_notes(description):
+    """返回步骤描述对应的注意事项列表（按规则顺序）"""
+    hits = set()
+    for labels in _matcher.match((description or '').lower()):
+        hits |= labels
+    notes = []
+    for index in sorted(hits):
+        notes.extend(NOTE_RULES[index][1])
+    return notes or list(DEFAULT_NOTES)
+
+
+def dump_notes(notes):
+    return json.dumps(notes, ensure_ascii=False)
+
+
+def load_notes(value):
+    try:
+        return json.loads(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,8 @@
+"""生产环境入口：gunicorn -c gunicorn.conf.py --bind 0.0.0.0:5000 wsgi:app
+
+数据库初始化（建表、迁移、全文索引、初始数据）由 gunicorn.conf.py 的 on_starting 在主进程启动时执行一次，
+每个 worker 导入本模块时只启动自己的后台任务线程。不使用该配置文件时，先执行 flask --app app db-upgrade。
+"""
+from app import app, init_worker
+
+init_worker()